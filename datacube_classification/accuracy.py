@@ -0,0 +1,156 @@
+#
+# This file is part of datacube-classification
+# Copyright (C) 2021 INPE.
+#
+# datacube-classification Library is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+#
+"""classification accuracy assessment module"""
+
+from collections import Counter
+from typing import List
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import rasterio as rio
+
+
+def confusion_matrix(tiles: List[str], reference: gpd.GeoDataFrame, label_col="label", band=1) -> pd.DataFrame:
+    """Creates the confusion matrix of a classification map stored in multiple tiles.
+
+    The tiles are processed one at a time and only the pixels where the reference samples are located are read
+    (windowed reads), so the whole mosaic is never loaded in memory. Samples outside all tiles or over nodata pixels are
+    not considered. Each sample is counted once, in the first tile with a valid pixel in its location.
+
+    Args:
+        tiles (list): classification tiles paths (e.g. GeoTIFF files generated by `ScikitLearnClassifier`)
+
+        reference (gpd.GeoDataFrame): reference samples (points) with the `label_col` column
+
+        label_col (str): Column in `reference` where the reference label is
+
+        band (int): band with the classification in the tiles
+    Returns:
+        pd.DataFrame: confusion matrix (rows are the map classes and columns the reference classes)
+    """
+
+    counts = Counter()
+    evaluated = np.zeros(len(reference), dtype=bool)
+    labels = reference[label_col].values
+
+    # reference coordinates by tile CRS
+    coordinates = {}
+
+    for tile in tiles:
+        with rio.open(tile) as src:
+            if src.crs.to_string() not in coordinates:
+                samples = reference.geometry.to_crs(src.crs)
+                coordinates[src.crs.to_string()] = (samples.x.values, samples.y.values)
+            x, y = coordinates[src.crs.to_string()]
+
+            bounds = src.bounds
+            in_tile = ~evaluated & (x >= bounds.left) & (x < bounds.right) & (y > bounds.bottom) & (y <= bounds.top)
+
+            if not in_tile.any():
+                continue
+
+            predicted = np.fromiter((value[0] for value in src.sample(
+                zip(x[in_tile], y[in_tile]), indexes=band
+            )), dtype=src.dtypes[band - 1], count=int(in_tile.sum()))
+
+            valid = predicted != src.nodata if src.nodata is not None else np.ones(predicted.shape, dtype=bool)
+            counts.update(zip(predicted[valid], labels[in_tile][valid]))
+
+            # samples over nodata pixels can be evaluated in the next tiles
+            evaluated[np.flatnonzero(in_tile)[valid]] = True
+
+    matrix = pd.Series(counts, dtype=int)
+    if matrix.empty:
+        return pd.DataFrame(dtype=int)
+
+    matrix = matrix.unstack(fill_value=0)
+    classes = matrix.index.union(matrix.columns)
+    return matrix.reindex(index=classes, columns=classes, fill_value=0).rename_axis(index="map", columns="reference")
+
+
+def class_area(tiles: List[str], band=1) -> pd.Series:
+    """Computes the mapped area of each class, reading the tiles block by block
+
+    Args:
+        tiles (list): classification tiles paths (overlapping areas are counted in each tile)
+
+        band (int): band with the classification in the tiles
+    Returns:
+        pd.Series: mapped area (in squared CRS units) by class
+    """
+
+    area = Counter()
+    for tile in tiles:
+        with rio.open(tile) as src:
+            pixel_area = abs(src.transform.a * src.transform.e)
+
+            for _, window in src.block_windows(band):
+                values = src.read(band, window=window)
+                if src.nodata is not None:
+                    values = values[values != src.nodata]
+
+                classes, counts = np.unique(values, return_counts=True)
+                area.update(dict(zip(classes, counts * pixel_area)))
+
+    return pd.Series(area, dtype=float).sort_index()
+
+
+def area_weighted_accuracy(matrix: pd.DataFrame, mapped_area: pd.Series) -> dict:
+    """Computes the area-weighted accuracy and the area estimates of a classification map
+
+    Args:
+        matrix (pd.DataFrame): confusion matrix (as returned by `confusion_matrix`)
+
+        mapped_area (pd.Series): mapped area by class (as returned by `class_area`)
+    Returns:
+        dict: overall accuracy, user's and producer's accuracy by class and estimated area by class
+    See:
+        Good practices for estimating area and assessing accuracy of land change (https://doi.org/10.1016/j.rse.2014.02.015)
+    """
+
+    classes = matrix.index.union(mapped_area.index)
+    matrix = matrix.reindex(index=classes, columns=classes, fill_value=0)
+
+    weights = mapped_area.reindex(classes, fill_value=0) / mapped_area.sum()
+
+    # estimated area proportions of each cell
+    proportions = matrix.div(matrix.sum(axis=1).replace(0, np.nan), axis=0).mul(weights, axis=0).fillna(0)
+    diagonal = pd.Series(np.diag(proportions), index=classes)
+
+    return {
+        "overall_accuracy": diagonal.sum(),
+        "users_accuracy": diagonal / proportions.sum(axis=1).replace(0, np.nan),
+        "producers_accuracy": diagonal / proportions.sum(axis=0).replace(0, np.nan),
+        "area": proportions.sum(axis=0) * mapped_area.sum()
+    }
+
+
+def accuracy_assessment(tiles: List[str], reference: gpd.GeoDataFrame, label_col="label", band=1) -> dict:
+    """Assesses the accuracy of a classification map stored in multiple tiles
+
+    Args:
+        tiles (list): classification tiles paths
+
+        reference (gpd.GeoDataFrame): reference samples (points) with the `label_col` column
+
+        label_col (str): Column in `reference` where the reference label is
+
+        band (int): band with the classification in the tiles
+    Returns:
+        dict: confusion matrix, mapped area by class and the `area_weighted_accuracy` results
+    """
+
+    matrix = confusion_matrix(tiles, reference, label_col, band)
+    mapped_area = class_area(tiles, band)
+
+    return {
+        "confusion_matrix": matrix,
+        "mapped_area": mapped_area,
+        **area_weighted_accuracy(matrix, mapped_area)
+    }
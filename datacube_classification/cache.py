@@ -0,0 +1,283 @@
+#
+# This file is part of datacube-classification
+# Copyright (C) 2021 INPE.
+#
+# datacube-classification Library is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+#
+"""preprocessed (cloud masked and interpolated) data cube cache module"""
+
+import glob
+import hashlib
+import os
+import tempfile
+import time
+import weakref
+
+import xarray
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    import msvcrt
+
+    fcntl = None
+
+from .cloud import cloud_mask
+from .interp import datacube_temporal_interpolate
+from .precision import get_precision
+
+
+class PreprocessingCache:
+    """On-disk cache of cloud masked and temporally interpolated data cubes.
+
+    Each preprocessed data cube is stored as a chunked and compressed netCDF-4 file, keyed by product, spatial
+    extent, timeline, bands, quality band and precision policy. Cached data cubes are opened lazily, so only the
+    chunks used are read. When the cache size exceeds `max_size`, the least recently used files are removed.
+
+    The cache can be shared by threads and processes. Each key has a lock file: a data cube is preprocessed and
+    written only once (concurrent consumers wait for it) and files opened by consumers (until the returned
+    dataset is garbage collected) or being written are never evicted. On Windows, where opened files can't be
+    removed, only the writers are locked.
+
+    Args:
+        directory (str): cache directory
+
+        product (str): product name used in cache keys (data cubes of different products with the same bands, extent
+        and timeline are stored separately)
+
+        max_size (int): cache size budget (in bytes)
+
+        compression_level (int): zlib compression level (1-9)
+
+        chunk_size (int): spatial chunk size of the cached files (the time dimension is not chunked)
+    """
+
+    def __init__(self, directory: str, product: str, max_size: int = 10 * 1024 ** 3, compression_level: int = 4,
+                 chunk_size: int = 256):
+        if not product:
+            raise ValueError("The product name of the cached data cubes must be defined")
+
+        os.makedirs(directory, exist_ok=True)
+
+        self._directory = directory
+        self._max_size = max_size
+        self._product = product
+        self._compression_level = compression_level
+        self._chunk_size = chunk_size
+
+    def key(self, data: xarray.Dataset, quality_band_name: str, product: str = None) -> str:
+        """Creates the cache key of a data cube
+
+        Args:
+            data (xarray.Dataset): data cube (before cloud masking)
+
+            quality_band_name (str): name of dimension in `data` where cloud mask is in
+
+            product (str): product name (if not defined, the cache product is used)
+        Returns:
+            str: cache key
+        """
+
+        key = hashlib.sha1()
+        key.update(repr((product or self._product, sorted(data.data_vars.keys()), quality_band_name,
+                         get_precision())).encode())
+
+        for dim in ("x", "y", "time"):
+            key.update(data[dim].values.tobytes())
+        return key.hexdigest()
+
+    def _path(self, key: str, extension: str = "nc") -> str:
+        return os.path.join(self._directory, f"{key}.{extension}")
+
+    def _encoding(self, data: xarray.Dataset) -> dict:
+        encoding = {}
+        for name, variable in data.data_vars.items():
+            chunksizes = tuple(
+                size if dim == "time" else min(size, self._chunk_size) for dim, size in zip(variable.dims, variable.shape)
+            )
+            encoding[name] = {"zlib": True, "complevel": self._compression_level, "chunksizes": chunksizes}
+        return encoding
+
+    def _lock(self, key: str, shared: bool = False, blocking: bool = True):
+        """Locks the cache file of `key`
+
+        Returns:
+            int: lock file descriptor (to be released with `_unlock`) or None if the lock is not available
+        """
+        path = self._path(key, "lock")
+
+        while True:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB))
+                elif not shared:
+                    _windows_lock(fd, blocking)
+            except BlockingIOError:
+                os.close(fd)
+                return None
+
+            # the lock file may have been removed (by `_evict`) before it was locked
+            try:
+                if os.path.samestat(os.fstat(fd), os.stat(path)):
+                    return fd
+            except FileNotFoundError:
+                pass
+            self._unlock(fd)
+
+    @staticmethod
+    def _unlock(fd: int):
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            _windows_unlock(fd)
+        os.close(fd)
+
+    def _evict(self):
+        files = []
+        for file in glob.glob(self._path("*")):
+            try:
+                files.append((os.path.getmtime(file), os.path.getsize(file), file))
+            except FileNotFoundError:
+                # removed by another consumer
+                continue
+
+        cache_size = sum(size for _, size, _ in files)
+        for _, size, file in sorted(files):
+            if cache_size <= self._max_size:
+                break
+
+            # files in use (opened or being written) are skipped
+            key = os.path.splitext(os.path.basename(file))[0]
+            fd = self._lock(key, blocking=False)
+            if fd is None:
+                continue
+
+            try:
+                os.remove(file)
+                cache_size -= size
+            except FileNotFoundError:
+                cache_size -= size
+            except PermissionError:
+                # opened in another process (Windows)
+                continue
+            finally:
+                self._remove_lock(key, fd)
+
+    def _remove_lock(self, key: str, fd: int):
+        """Removes the lock file of `key` (locked with `fd`) if its data cube is not cached"""
+        try:
+            if not os.path.exists(self._path(key)):
+                os.remove(self._path(key, "lock"))
+        except OSError:
+            # the lock file can't be removed while it is opened (Windows)
+            pass
+        finally:
+            self._unlock(fd)
+
+    def _store(self, key: str, data: xarray.Dataset):
+        # attributes (e.g. CRS objects) can't be serialized. They are restored from the input data cube
+        stored = data.copy()
+        stored.attrs = {}
+        for variable in stored.variables.values():
+            variable.attrs = {}
+
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self._directory)
+        os.close(fd)
+        try:
+            stored.to_netcdf(tmp_path, encoding=self._encoding(stored))
+            os.replace(tmp_path, self._path(key))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def get(self, data: xarray.Dataset, quality_band_name: str, product: str = None) -> xarray.Dataset:
+        """Returns the cloud masked and interpolated data cube, preprocessing and storing it if it is not cached
+
+        Args:
+            data (xarray.Dataset): data cube (with the quality band)
+
+            quality_band_name (str): name of dimension in `data` where cloud mask is in
+
+            product (str): product name
+        Returns:
+            xarray.Dataset: cloud masked and interpolated data cube
+        """
+
+        key = self.key(data, quality_band_name, product)
+        path = self._path(key)
+
+        while True:
+            # the shared lock is kept while the cached file is open, so it is not evicted
+            fd = self._lock(key, shared=True)
+            try:
+                # update the file last use (LRU)
+                os.utime(path)
+                preprocessed = xarray.open_dataset(path)
+            except FileNotFoundError:
+                self._unlock(fd)
+            except BaseException:
+                self._unlock(fd)
+                raise
+            else:
+                weakref.finalize(preprocessed, self._unlock, fd)
+
+                preprocessed.attrs = dict(data.attrs)
+                for name, variable in preprocessed.variables.items():
+                    if name in data.variables:
+                        variable.attrs = dict(data[name].attrs)
+                return preprocessed
+
+            # cache miss: only one consumer preprocesses the data cube, the others wait and read it
+            fd = self._lock(key)
+            try:
+                if os.path.isfile(path):
+                    continue
+
+                preprocessed = datacube_temporal_interpolate(cloud_mask(data, quality_band_name))
+                self._store(key, preprocessed)
+            finally:
+                self._remove_lock(key, fd)
+
+            self._evict()
+            return preprocessed
+
+
+def _windows_lock(fd: int, blocking: bool):
+    # msvcrt only waits a few seconds for a lock
+    while True:
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return
+        except OSError:
+            if not blocking:
+                raise BlockingIOError
+            time.sleep(0.1)
+
+
+def _windows_unlock(fd: int):
+    try:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    except OSError:
+        # shared locks are not used on Windows
+        pass
+
+
+def preprocess(data: xarray.Dataset, quality_band_name: str, cache: PreprocessingCache = None) -> xarray.Dataset:
+    """Applies the cloud mask and the temporal interpolation in a data cube, using `cache` if it is defined
+
+    Args:
+        data (xarray.Dataset): data cube (with the quality band)
+
+        quality_band_name (str): name of dimension in `data` where cloud mask is in
+
+        cache (PreprocessingCache): preprocessed data cubes cache
+    Returns:
+        xarray.Dataset: cloud masked and interpolated data cube
+    """
+
+    if cache is not None:
+        return cache.get(data, quality_band_name)
+    return datacube_temporal_interpolate(cloud_mask(data, quality_band_name))
@@ -7,6 +7,8 @@
 #
 """datacube-stats cloud cover operations module"""
 
+from .precision import as_float
+
 
 def cloud_mask(data, quality_band_name):
     """It clips the data using a cloud mask. The currently supported cloud mask is FMask 4.1,
@@ -20,12 +22,12 @@ def cloud_mask(data, quality_band_name):
 
         quality_band_name (str): name of dimension in `data` where cloud mask is in
     Returns:
-        xarray.Dataset: Dataset masked with cloud mask (without the `quality_band_name` dimension)
+        xarray.Dataset: Dataset masked with cloud mask (without the `quality_band_name` dimension). The values are
+        cast to the floating point dtype of the precision policy (see `datacube_classification.precision`)
     """
 
     # assume that the quality band was generated using Fmask (v4.1)
-    cloud_and_shadow = data[quality_band_name].where(
-        (data[quality_band_name] != 2) & (data[quality_band_name] != 4)
-    )
+    quality = data[quality_band_name]
+    clear = quality.notnull() & (quality != 2) & (quality != 4)
 
-    return data.drop(quality_band_name) * cloud_and_shadow.where(cloud_and_shadow.isnull(), 1)
+    return as_float(data.drop(quality_band_name)).where(clear)
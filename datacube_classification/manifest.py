@@ -0,0 +1,341 @@
+#
+# This file is part of datacube-classification
+# Copyright (C) 2021 INPE.
+#
+# datacube-classification Library is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+#
+"""processing manifests module (used to reprocess only the blocks with changed inputs)"""
+
+import glob
+import hashlib
+import json
+import os
+import tempfile
+from typing import List
+
+import pandas as pd
+import xarray
+
+from .precision import get_precision
+from .version import __version__
+
+
+def file_checksum(path: str, block_size: int = 2 ** 20) -> str:
+    """Computes the sha256 checksum of a file (e.g. a classification model)
+
+    Args:
+        path (str): file path
+
+        block_size (int): size of the blocks read from the file
+    Returns:
+        str: checksum
+    """
+
+    checksum = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            checksum.update(block)
+    return checksum.hexdigest()
+
+
+def configuration_checksum(configuration: dict) -> str:
+    """Computes the checksum of an operation configuration
+
+    Args:
+        configuration (dict): operation arguments
+    Returns:
+        str: checksum
+    """
+    return hashlib.sha256(json.dumps(configuration, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def datasets_fingerprint(datasets) -> List[dict]:
+    """Creates the fingerprint (ids and metadata checksums) of ODC datasets
+
+    Args:
+        datasets (list): datacube.model.Dataset objects
+    Returns:
+        list: `id` and `checksum` of each dataset (sorted by id)
+    """
+
+    return sorted((
+        {"id": str(dataset.id), "checksum": configuration_checksum(dataset.metadata_doc)} for dataset in datasets
+    ), key=lambda dataset: dataset["id"])
+
+
+def find_datasets(dc, products: List[str], extent: dict):
+    """Finds the ODC datasets used to process a block
+
+    Args:
+        dc (datacube.Datacube): datacube instance
+
+        products (list): input products names
+
+        extent (dict): block extent (as created by `block_extent`)
+    Returns:
+        list: datacube.model.Dataset objects
+    """
+
+    return [
+        dataset
+        for product in products
+        for dataset in dc.find_datasets(product=product, time=tuple(extent["time"]), crs=extent["crs"],
+                                        x=(extent["left"], extent["right"]), y=(extent["bottom"], extent["top"]))
+    ]
+
+
+def loaded_datasets(datasets, data: xarray.Dataset):
+    """Selects the datasets acquired in the dates of a loaded block
+
+    Args:
+        datasets (list): datacube.model.Dataset objects (e.g. as returned by `find_datasets`)
+
+        data (xarray.Dataset): loaded block
+    Returns:
+        list: datacube.model.Dataset objects acquired in the block dates
+    """
+
+    dates = set(pd.DatetimeIndex(data.time.values).normalize())
+
+    def acquisition_date(dataset):
+        timestamp = pd.Timestamp(dataset.center_time)
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.tz_convert(None)
+        return timestamp.normalize()
+
+    return [dataset for dataset in datasets if acquisition_date(dataset) in dates]
+
+
+def block_extent(data: xarray.Dataset, time: list) -> dict:
+    """Creates the spatio-temporal extent of a block
+
+    Args:
+        data (xarray.Dataset): input block
+
+        time (list): processing time range (start and end) used to search the block inputs
+    Returns:
+        dict: block extent
+    """
+
+    return {
+        "crs": str(data.crs),
+        "left": float(data.x.values.min()),
+        "right": float(data.x.values.max()),
+        "bottom": float(data.y.values.min()),
+        "top": float(data.y.values.max()),
+        "time": [str(value) for value in time]
+    }
+
+
+class ManifestRecorder:
+    """Records a manifest for each block processed by an operation.
+
+    A manifest contains the block extent, the input datasets (ids and metadata checksums), the checksum of the
+    operation configuration and of the precision policy (see `datacube_classification.precision`), the models
+    checksums and the package version.
+
+    The operations record the manifests while computing a block, before datacube-stats writes its outputs, so they
+    are recorded as pending. After datacube-stats successfully writes the outputs, the pending manifests must be
+    confirmed with `commit`. With `plan`, the manifests are compared with the current inputs to find the blocks that
+    must be reprocessed (including the blocks with pending manifests) and, with `plan_region`, these blocks are
+    converted to a datacube-stats `input_region`, so only them are recomputed.
+
+    Args:
+        directory (str): manifests directory
+
+        products (list): input products names (as used in the datacube-stats `sources`)
+
+        time (list): processing time range (start and end) of the inputs, as in the datacube-stats `date_ranges`
+        (`start_date` and `end_date`). The loaded block timeline can't be used, since scenes ingested after the block
+        last acquisition would be outside it
+
+        operation (str): operation name (use the output product name when the same operation generates multiple
+        products)
+
+        configuration (dict): operation arguments
+
+        model_files (list): paths of the models used by the operation
+
+        dc (datacube.Datacube): datacube instance used to search the inputs. If not defined, it is created when needed
+    """
+
+    def __init__(self, directory: str, products: List[str], time: list, operation: str = None,
+                 configuration: dict = None, model_files: List[str] = None, dc=None):
+        if not time or len(time) != 2:
+            raise ValueError("The processing time range (start and end) must be defined")
+
+        os.makedirs(directory, exist_ok=True)
+
+        self._directory = directory
+        self._products = list(products)
+        self._time = list(time)
+        self._operation = operation
+        self._configuration = configuration or {}
+        self._models = {path: file_checksum(path) for path in (model_files or [])}
+
+        self._dc = dc
+
+    def _datacube(self):
+        if self._dc is None:
+            from datacube import Datacube
+            self._dc = Datacube(app="datacube-classification")
+        return self._dc
+
+    def manifest(self, extent: dict, datasets=None) -> dict:
+        """Creates the manifest of a block
+
+        Args:
+            extent (dict): block extent (as created by `block_extent`)
+
+            datasets (list): input datasets (datacube.model.Dataset objects). If not defined, the current inputs are
+            searched in the index
+        Returns:
+            dict: manifest
+        """
+        if datasets is None:
+            datasets = find_datasets(self._datacube(), self._products, extent)
+
+        return {
+            "operation": self._operation,
+            "extent": extent,
+            "products": self._products,
+            "inputs": datasets_fingerprint(datasets),
+            "configuration": configuration_checksum({**self._configuration, "precision": get_precision()}),
+            "models": self._models,
+            "version": __version__
+        }
+
+    def _path(self, extent: dict, pending: bool = False) -> str:
+        key = configuration_checksum({"operation": self._operation, "extent": extent})
+        return os.path.join(self._directory, f"{key}.pending.json" if pending else f"{key}.json")
+
+    def record(self, data: xarray.Dataset) -> dict:
+        """Records the (pending) manifest of a processed block.
+
+        Only the datasets acquired in the loaded block dates are recorded, so scenes ingested after the block was
+        loaded are not considered processed.
+
+        Args:
+            data (xarray.Dataset): input block
+        Returns:
+            dict: recorded manifest
+        """
+
+        extent = block_extent(data, self._time)
+        manifest = self.manifest(extent, loaded_datasets(find_datasets(self._datacube(), self._products, extent), data))
+
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self._directory)
+        with os.fdopen(fd, "w") as file:
+            json.dump(manifest, file, indent=2)
+        os.replace(tmp_path, self._path(extent, pending=True))
+
+        return manifest
+
+    def _manifests(self, pending: bool) -> List[tuple]:
+        manifests = []
+        for path in sorted(glob.glob(os.path.join(self._directory, "*.pending.json" if pending else "*.json"))):
+            if not pending and path.endswith(".pending.json"):
+                continue
+
+            with open(path) as file:
+                manifest = json.load(file)
+
+            if manifest["operation"] == self._operation:
+                manifests.append((path, manifest))
+        return manifests
+
+    def commit(self) -> int:
+        """Confirms the pending manifests of the operation. It must be called after datacube-stats successfully writes
+        the outputs (blocks whose outputs were not written must be reprocessed)
+
+        Returns:
+            int: number of confirmed manifests
+        """
+
+        manifests = self._manifests(pending=True)
+        for path, manifest in manifests:
+            os.replace(path, self._path(manifest["extent"]))
+        return len(manifests)
+
+    def is_stale(self, manifest: dict) -> bool:
+        """Checks if a recorded manifest differs from the current inputs, configuration, models or version
+
+        Args:
+            manifest (dict): recorded manifest
+        Returns:
+            bool: True if the block must be reprocessed
+        """
+        return manifest != self.manifest(manifest["extent"])
+
+    def plan(self) -> List[dict]:
+        """Finds the recorded blocks that must be reprocessed
+
+        Returns:
+            list: extents of the stale blocks and of the blocks with pending manifests (blocks never processed are not
+            listed)
+        """
+
+        stale = [manifest["extent"] for _, manifest in self._manifests(pending=True)]
+        for _, manifest in self._manifests(pending=False):
+            if manifest["extent"] not in stale and self.is_stale(manifest):
+                stale.append(manifest["extent"])
+        return stale
+
+    def plan_region(self, path: str) -> dict:
+        """Writes the stale blocks (see `plan`) as polygons in a GeoJSON file, to be used as the datacube-stats
+        `input_region`, so only the tiles that contain stale blocks are recomputed
+
+        Args:
+            path (str): GeoJSON file path
+        Returns:
+            dict: datacube-stats `input_region` (or None if there are no stale blocks)
+        """
+        import geopandas as gpd
+        from shapely.geometry import box
+
+        extents = self.plan()
+        if not extents:
+            return None
+
+        crs = {extent["crs"] for extent in extents}
+        if len(crs) != 1:
+            raise ValueError(f"The stale blocks have different CRS: {', '.join(sorted(crs))}")
+
+        gpd.GeoDataFrame({"block": range(len(extents))}, geometry=[
+            box(extent["left"], extent["bottom"], extent["right"], extent["top"]) for extent in extents
+        ], crs=crs.pop()).to_file(path, driver="GeoJSON")
+
+        return {"from_file": path}
+
+
+class ManifestMixin:
+    """Adds processing manifests to datacube-stats operations (see `ManifestRecorder`)"""
+
+    _manifest = None
+
+    def _setup_manifest(self, manifest: dict, configuration: dict, model_files: List[str] = None):
+        """Creates the manifest recorder of the operation
+
+        Args:
+            manifest (dict): `ManifestRecorder` arguments (if not defined, manifests are not recorded)
+
+            configuration (dict): operation arguments that change its results
+
+            model_files (list): paths of the models used by the operation
+        """
+        if manifest:
+            self._manifest = ManifestRecorder(**{"operation": type(self).__name__, **manifest},
+                                              configuration=configuration, model_files=model_files)
+
+    def _record_manifest(self, data: xarray.Dataset):
+        if self._manifest:
+            self._manifest.record(data)
+
+    def stale_blocks(self) -> List[dict]:
+        """Finds the processed blocks whose inputs, configuration or models changed (see `ManifestRecorder.plan`)
+
+        Returns:
+            list: extents of the blocks that must be reprocessed
+        """
+        return self._manifest.plan() if self._manifest else []
@@ -7,6 +7,10 @@
 #
 """classification models module"""
 
+import time
+
+import geopandas as gpd
+import numpy as np
 import pandas as pd
 
 
@@ -33,3 +37,115 @@ def train_sklearn_model(model, labeled_timeseries: pd.DataFrame, label_col="labe
     y = labeled_timeseries[label_col].astype(int)
 
     return model.fit(x, y)
+
+
+def _fit_and_score(model, x, y, train, test, scoring):
+    """Fits `model` with the `train` samples and scores it with the `test` samples (executed in the workers).
+
+    `test` is a slice, so the test subset is a view of `x`. The train subset is copied, since scikit-learn models
+    are fitted with a single array.
+    """
+    from sklearn.metrics import check_scoring
+
+    start = time.perf_counter()
+    model.fit(x[train], y[train])
+    fit_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    score = check_scoring(model, scoring)(model, x[test], y[test])
+    return fit_time, time.perf_counter() - start, score
+
+
+def _cv_folds(labeled_timeseries: pd.DataFrame, y, geometry_location: gpd.GeoDataFrame = None,
+              block_size: float = None, n_splits: int = 5, random_state: int = None) -> list:
+    """Creates the cross-validation folds (spatially blocked if `geometry_location` and `block_size` are defined)
+
+    Returns:
+        list: train and test samples positions of each fold
+    """
+    from sklearn.model_selection import GroupKFold, StratifiedKFold
+
+    if geometry_location is not None and block_size:
+        # samples not extracted (e.g. outside all data cubes) are not in `labeled_timeseries`
+        geometry = geometry_location.geometry.loc[labeled_timeseries.index]
+
+        blocks = list(zip(geometry.x // block_size, geometry.y // block_size))
+        return list(GroupKFold(n_splits=n_splits).split(y, y, groups=pd.factorize(pd.Series(blocks))[0]))
+
+    return list(StratifiedKFold(n_splits=n_splits, shuffle=random_state is not None,
+                                random_state=random_state).split(y, y))
+
+
+def select_sklearn_model(model, labeled_timeseries: pd.DataFrame, param_grid: dict, label_col="label",
+                         geometry_location: gpd.GeoDataFrame = None, block_size: float = None, n_splits: int = 5,
+                         scoring: str = None, n_jobs: int = -1, random_state: int = None):
+    """Selects the hyperparameters of a sklearn model using cross-validation over the time series extracted with the
+    `datacube_classification.sits.datacube_get_sits` function
+
+    The feature matrix is converted to a single array once, ordered by test fold, and each (hyperparameters, fold)
+    pair is evaluated in parallel. joblib shares the array with the worker processes through a memory-mapped file
+    (instead of copying the table to each worker) and the test subsets are views of it. The train subsets are still
+    copied by each task, since scikit-learn models are fitted with a single array. When `geometry_location` and
+    `block_size` are defined, spatially blocked k-fold is used (samples in the same spatial block are always in the
+    same fold). Otherwise, stratified k-fold is used.
+
+    Args:
+        model (object): scikit-learn classification model
+
+        labeled_timeseries (pd.DataFrame): table with time-series extracted from a data cube. Each instance must be have
+        a label associated
+
+        param_grid (dict): hyperparameters grid (as in `sklearn.model_selection.ParameterGrid`)
+
+        label_col (str): column where labels is in `labeled_timeseries`
+
+        geometry_location (gpd.GeoDataFrame): samples locations. It is aligned with `labeled_timeseries` by index
+        (e.g. the samples given to `datacube_classification.sits.datacubes_get_sits`)
+
+        block_size (float): spatial block size (in `geometry_location` CRS units)
+
+        n_splits (int): number of folds
+
+        scoring (str): scikit-learn scoring name. If not defined, the model `score` method is used
+
+        n_jobs (int): number of worker processes
+
+        random_state (int): seed used to shuffle the stratified folds
+    Returns:
+        tuple: best model (trained with all samples) and a table with the score and timing of each fold
+    """
+    from joblib import Parallel, delayed
+    from sklearn.base import clone
+    from sklearn.model_selection import ParameterGrid
+
+    # same features order used in `train_sklearn_model`
+    features = labeled_timeseries[labeled_timeseries.columns.difference([label_col])]
+    y = labeled_timeseries[label_col].astype(int).to_numpy()
+
+    folds = _cv_folds(labeled_timeseries, y, geometry_location, block_size, n_splits, random_state)
+
+    # samples ordered by test fold, so each test subset is a contiguous slice
+    order = np.concatenate([test for _, test in folds])
+    position = np.empty_like(order)
+    position[order] = np.arange(order.shape[0])
+
+    x = features.to_numpy()[order]
+    y = y[order]
+
+    bounds = np.cumsum([0] + [test.shape[0] for _, test in folds])
+    folds = [(position[train], slice(start, stop)) for (train, _), start, stop in zip(folds, bounds[:-1], bounds[1:])]
+
+    candidates = list(ParameterGrid(param_grid))
+
+    # large arrays are automatically memory-mapped by joblib
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_and_score)(clone(model).set_params(**params), x, y, train, test, scoring)
+        for params in candidates for train, test in folds
+    )
+    report = pd.DataFrame([
+        {"candidate": candidate, "params": params, "fold": fold}
+        for candidate, params in enumerate(candidates) for fold in range(len(folds))
+    ]).join(pd.DataFrame(results, columns=["fit_time", "score_time", "score"]))
+
+    best_params = candidates[report.groupby("candidate")["score"].mean().idxmax()]
+    return train_sklearn_model(clone(model).set_params(**best_params), labeled_timeseries, label_col), report
@@ -14,12 +14,55 @@ import numpy as np
 import xarray
 from datacube.model import Measurement
 from datacube_stats.statistics import Statistic
-from joblib import load
+from joblib import Parallel, delayed, load
 
+from .output import OutputBuilder
+from ..cache import PreprocessingCache
+from ..manifest import ManifestMixin
 from ..sits import datacube_to_sits
 
 
-class ScikitLearnClassifier(Statistic):
+def _load_model(classification_model: str):
+    """Loads a pre-trained scikit-learn model
+
+    Args:
+        classification_model (str): model path
+    Returns:
+        object: scikit-learn model
+    """
+    if not os.path.isfile(classification_model):
+        raise RuntimeError("scikit-learn can't be loaded")
+    return load(classification_model)
+
+
+def _smoothed_classification(classes, classification_probs, data: xarray.Dataset, smoothing: dict, factor):
+    """Classifies the pixels of a block after the bayes spatial smoothing of the classes probabilities
+
+    Args:
+        classes (np.array): classes labels, in the probabilities order (`classes_` of the model)
+
+        classification_probs (np.array): classes probabilities (as returned by `predict_proba`)
+
+        data (xarray.Dataset): classified block
+
+        smoothing (dict): `datacube_classification.spatial_smoothing.bayes_spatial_smoothing` arguments
+
+        factor (int): factor applied to the probabilities
+    Returns:
+        np.array: classification (classes labels)
+    """
+    # only bayes is used here
+    from ..spatial_smoothing import bayes_spatial_smoothing, guess_type
+
+    classification_probs_smoothed = bayes_spatial_smoothing((classification_probs * factor).astype(int),
+                                                            xblock_size=data.x.shape[0],
+                                                            yblock_size=data.y.shape[0],
+                                                            **smoothing,
+                                                            factor=1 / factor)
+    return classes[guess_type(classification_probs_smoothed)]
+
+
+class ScikitLearnClassifier(ManifestMixin, Statistic):
     """scikit-learn Classifier to be used as datacube-stats Statistics.
 
     This function loads a pre-trained classifier model from sklearn and uses it to classify the time series
@@ -31,49 +74,46 @@ class ScikitLearnClassifier(Statistic):
         factor (int): factor applied to divided data cube values
 
         quality_band_name (str): name of dimension in `data` where cloud mask is in
-    """
 
-    def __init__(self, classification_model: str, quality_band_name: str = None, smoothing: dict = None, factor=10000):
-        if not os.path.isfile(classification_model):
-            raise RuntimeError("scikit-learn can't be loaded")
+        cache (dict): `datacube_classification.cache.PreprocessingCache` arguments (directory, product and max_size)
 
+        manifest (dict): `datacube_classification.manifest.ManifestRecorder` arguments (directory, products and time)
+
+        coordinates (str): output coordinates: `1d` (only `x` and `y`) or `2d` (also the `x_coordinate` and
+        `y_coordinate`, see `datacube_classification.operations.output.block_coordinates`)
+    """
+
+    def __init__(self, classification_model: str, quality_band_name: str = None, smoothing: dict = None, factor=10000,
+                 cache: dict = None, manifest: dict = None, coordinates: str = "2d"):
         self._factor = factor
+        self._coordinates = coordinates
         self._quality_band_name = quality_band_name
-        self._classification_model = load(classification_model)
+        self._classification_model = _load_model(classification_model)
 
         self._smoothing = smoothing
+        self._cache = PreprocessingCache(**cache) if cache else None
+        self._setup_manifest(manifest, model_files=[classification_model],
+                             configuration={"quality_band_name": quality_band_name, "smoothing": smoothing,
+                                            "factor": factor})
 
     def compute(self, data: xarray.Dataset) -> xarray.Dataset:
-        x, y = np.meshgrid(data.x.values, data.y.values)
         # datacube-stats sometimes generate NA between blocks
-        sits = datacube_to_sits(data, quality_band_name=self._quality_band_name, factor=self._factor).fillna(-9999)
+        sits = datacube_to_sits(data, quality_band_name=self._quality_band_name, factor=self._factor,
+                                cache=self._cache).fillna(-9999)
 
         # smooth ?
         if self._smoothing:
-            # only bayes is used here
-            from ..spatial_smoothing import bayes_spatial_smoothing, guess_type
-
-            classification_probs = (self._classification_model.predict_proba(sits) * self._factor).astype(int)
-            classification_probs_smoothed = bayes_spatial_smoothing(classification_probs,
-                                                                    xblock_size=data.x.shape[0],
-                                                                    yblock_size=data.y.shape[0],
-                                                                    **self._smoothing,
-                                                                    factor=1 / self._factor)
-
-            classification = guess_type(classification_probs_smoothed)
+            classification = _smoothed_classification(self._classification_model.classes_,
+                                                      self._classification_model.predict_proba(sits), data,
+                                                      self._smoothing, self._factor)
         else:
             classification = self._classification_model.predict(sits)
 
-        return xarray.Dataset({
-            "classification": (["x", "y"], classification.reshape((
-                data.dims["y"], data.dims["x"]
-            ))),
-        }, coords={
-            "x_coordinate": (["x", "y"], x),
-            "y_coordinate": (["x", "y"], y)
-        },
-            attrs={"crs": data.crs}
-        )
+        output = OutputBuilder(data, self.measurements([]), self._coordinates)
+        output.write("classification", classification)
+
+        self._record_manifest(data)
+        return output.build()
 
     def measurements(self, input_measurements: List[Dict]) -> List:
         return [Measurement(
@@ -82,3 +122,113 @@ class ScikitLearnClassifier(Statistic):
             units="m",
             nodata=-9999
         )]
+
+
+class ScikitLearnMultiClassifier(ManifestMixin, Statistic):
+    """Multiple scikit-learn Classifiers to be used as datacube-stats Statistics.
+
+    This class classifies the data cube with several pre-trained scikit-learn models (e.g. different seeds, algorithms
+    or per-biome models). The time series of each block are extracted once and shared by all models, so the cost
+    of N classification maps is one extraction plus N predictions. Optionally, a soft-voting ensemble (mean of the
+    classes probabilities of all models) is also generated.
+
+    The output measurements are named `classification_<model name>` and `classification_ensemble`.
+
+    Args:
+        classification_models (dict): models path by model name
+
+        quality_band_name (str): name of dimension in `data` where cloud mask is in
+
+        smoothing (dict): bayes spatial smoothing arguments (applied in all classifications)
+
+        ensemble (str): ensemble mode. Currently, only `soft` (soft-voting) is supported
+
+        n_jobs (int): number of models predicted in parallel (threads are used, so the time series are not copied)
+
+        factor (int): factor applied to divided data cube values
+
+        cache (dict): `datacube_classification.cache.PreprocessingCache` arguments (directory, product and max_size)
+
+        manifest (dict): `datacube_classification.manifest.ManifestRecorder` arguments (directory, products and time)
+
+        coordinates (str): output coordinates: `1d` (only `x` and `y`) or `2d` (also the `x_coordinate` and
+        `y_coordinate`, see `datacube_classification.operations.output.block_coordinates`)
+    """
+
+    def __init__(self, classification_models: dict, quality_band_name: str = None, smoothing: dict = None,
+                 ensemble: str = None, n_jobs: int = 1, factor=10000, cache: dict = None, manifest: dict = None,
+                 coordinates: str = "2d"):
+        if ensemble not in (None, "soft"):
+            raise RuntimeError(f"Invalid ensemble mode: {ensemble}")
+
+        self._factor = factor
+        self._coordinates = coordinates
+        self._quality_band_name = quality_band_name
+        self._classification_models = {
+            name: _load_model(classification_model) for name, classification_model in classification_models.items()
+        }
+
+        if ensemble:
+            models_classes = [model.classes_ for model in self._classification_models.values()]
+            if any(not np.array_equal(models_classes[0], classes) for classes in models_classes[1:]):
+                raise RuntimeError("All models must be trained with the same classes to generate the ensemble")
+
+        self._smoothing = smoothing
+        self._ensemble = ensemble
+        self._n_jobs = n_jobs
+        self._cache = PreprocessingCache(**cache) if cache else None
+        self._setup_manifest(manifest, model_files=list(classification_models.values()),
+                             configuration={"classification_models": classification_models,
+                                            "quality_band_name": quality_band_name, "smoothing": smoothing,
+                                            "ensemble": ensemble, "factor": factor})
+
+    def _predict(self, model, sits, data: xarray.Dataset):
+        """Classifies the time series with one model
+
+        Returns:
+            tuple: classification and classes probabilities (only computed when they are used)
+        """
+        # probabilities are only required to smooth or to generate the ensemble
+        probs = model.predict_proba(sits) if self._smoothing or self._ensemble else None
+
+        if self._smoothing:
+            return _smoothed_classification(model.classes_, probs, data, self._smoothing, self._factor), probs
+        return model.predict(sits), probs
+
+    def compute(self, data: xarray.Dataset) -> xarray.Dataset:
+        # datacube-stats sometimes generate NA between blocks
+        sits = datacube_to_sits(data, quality_band_name=self._quality_band_name, factor=self._factor,
+                                cache=self._cache).fillna(-9999)
+
+        models = list(self._classification_models.values())
+        predictions = Parallel(n_jobs=self._n_jobs, prefer="threads")(
+            delayed(self._predict)(model, sits, data) for model in models
+        )
+
+        output = OutputBuilder(data, self.measurements([]), self._coordinates)
+        for name, (classification, _) in zip(self._classification_models.keys(), predictions):
+            output.write(f"classification_{name}", classification)
+
+        if self._ensemble:
+            probs = np.mean([probs for _, probs in predictions], axis=0)
+            if self._smoothing:
+                classification = _smoothed_classification(models[0].classes_, probs, data, self._smoothing,
+                                                          self._factor)
+            else:
+                classification = models[0].classes_[probs.argmax(axis=1)]
+            output.write("classification_ensemble", classification)
+
+        self._record_manifest(data)
+        return output.build()
+
+    def measurements(self, input_measurements: List[Dict]) -> List:
+        names = [f"classification_{name}" for name in self._classification_models.keys()]
+        if self._ensemble:
+            names.append("classification_ensemble")
+
+        return [Measurement(
+            name=name,
+            dtype='int16',
+            units="m",
+            nodata=-9999
+        ) for name in names]
@@ -9,11 +9,14 @@
 
 from typing import List, Dict
 
-import numpy as np
 import xarray
 from datacube.model import Measurement
 from datacube_stats.statistics import Statistic
 
+from .output import OutputBuilder
+from ..manifest import ManifestMixin
+from ..precision import to_reflectance
+
 
 class Measurements2Cube(Statistic):
     """This statistic class performs the creation of a cube from a specific measurement. This cube is intended for use in
@@ -32,29 +35,25 @@ class Measurements2Cube(Statistic):
         nodata (str): measurement output nodata
 
         units (str): measurement output units
+
+        coordinates (str): output coordinates: `1d` (only `x` and `y`) or `2d` (also the `x_coordinate` and
+        `y_coordinate`, see `datacube_classification.operations.output.block_coordinates`)
     """
 
-    def __init__(self, measurement, measurement_key=None, dtype="int16", nodata=255, units="m"):
+    def __init__(self, measurement, measurement_key=None, dtype="int16", nodata=255, units="m", coordinates="2d"):
         self._measurement = measurement
         self._measurement_key = measurement_key or measurement
 
         self._dtype = dtype
         self._nodata = nodata
         self._units = units
+        self._coordinates = coordinates
 
     def compute(self, data: xarray.Dataset) -> xarray.Dataset:
-        x, y = np.meshgrid(data.x.values, data.y.values)
-
-        return xarray.Dataset({
-            self._measurement: (["x", "y"], data[self._measurement_key].values.reshape((
-                data.dims["y"], data.dims["x"]
-            ))),
-        }, coords={
-            "x_coordinate": (["x", "y"], x),
-            "y_coordinate": (["x", "y"], y)
-        },
-            attrs={"crs": data.crs}
-        )
+        output = OutputBuilder(data, self.measurements([]), self._coordinates)
+        output.write(self._measurement, data[self._measurement_key].values)
+
+        return output.build()
 
     def measurements(self, input_measurements: List[Dict]) -> List:
         return [
@@ -75,7 +74,7 @@ def _load_user_defined_function(function_name: str, module_name: str):
     return getattr(importlib.import_module(module_name), function_name)
 
 
-class MeasurementGenerator(Statistic):
+class MeasurementGenerator(ManifestMixin, Statistic):
     """This statistic class performs the creation of a multi custom measurement cube from user defined functions.
     Args:
         operators (dict): cube measurements specification. This variable must specify all the metadata of the
@@ -94,13 +93,23 @@ class MeasurementGenerator(Statistic):
                 red_band: 'band3'
                 green_band: 'band2'
 
+        The user defined functions receive the data cube values divided by `factor` (in the floating point dtype of
+        the precision policy, see `datacube_classification.precision`). The function result is multiplied by
+        `factor`.
+
+        manifest (dict): `datacube_classification.manifest.ManifestRecorder` arguments (directory, products and time)
+
+        coordinates (str): output coordinates: `1d` (only `x` and `y`) or `2d` (also the `x_coordinate` and
+        `y_coordinate`, see `datacube_classification.operations.output.block_coordinates`)
     """
 
-    def __init__(self, operators: dict):
+    def __init__(self, operators: dict, manifest: dict = None, coordinates: str = "2d"):
         self._operators: dict = operators
+        self._coordinates = coordinates
+        self._setup_manifest(manifest, configuration=operators)
 
     def compute(self, data: xarray.Dataset) -> xarray.Dataset:
-        values = {}
+        output = OutputBuilder(data, self.measurements([]), self._coordinates)
 
         # apply each user defined function in input data
         for measure in self._operators.keys():
@@ -109,16 +118,11 @@ class MeasurementGenerator(Statistic):
 
             measure_args = measure_definition["args"]
             measure_factor = measure_definition["factor"]
-            values[measure] = (
-                ["x", "y"], measure_function(data / measure_factor, **measure_args)[0,] * measure_factor)
-
-        x, y = np.meshgrid(data.x.values, data.y.values)
-        return xarray.Dataset(values, coords={
-            "x_coordinate": (["x", "y"], x),
-            "y_coordinate": (["x", "y"], y)
-        }, attrs={
-            "crs": data.crs
-        })
+            values = measure_function(to_reflectance(data, measure_factor), **measure_args)
+            output.write(measure, values[0,] * measure_factor)
+
+        self._record_manifest(data)
+        return output.build()
 
     def measurements(self, input_measurements: List[Dict]) -> List:
         return [
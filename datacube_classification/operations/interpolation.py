@@ -12,8 +12,7 @@ from typing import List, Dict
 import xarray
 from datacube_stats.statistics import Statistic
 
-from ..cloud import cloud_mask
-from ..interp import datacube_temporal_interpolate
+from ..cache import PreprocessingCache, preprocess
 
 
 class TemporalLinearInterpolation(Statistic):
@@ -24,15 +23,16 @@ class TemporalLinearInterpolation(Statistic):
 
     Args:
         quality_band_name (str): quality band name (e.g. Fmask4, Cmask)
+
+        cache (dict): `datacube_classification.cache.PreprocessingCache` arguments (directory, product and max_size)
     """
 
-    def __init__(self, quality_band_name: str):
+    def __init__(self, quality_band_name: str, cache: dict = None):
         self._quality_band_name = quality_band_name
+        self._cache = PreprocessingCache(**cache) if cache else None
 
     def compute(self, data: xarray.Dataset) -> xarray.Dataset:
-        return datacube_temporal_interpolate(
-            cloud_mask(data, self._quality_band_name)
-        )
+        return preprocess(data, self._quality_band_name, self._cache)
 
     def measurements(self, input_measurements: List[Dict]) -> List:
         return list(filter(lambda x: x["name"] != self._quality_band_name, input_measurements))
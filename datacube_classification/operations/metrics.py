@@ -13,6 +13,8 @@ import xarray
 from datacube.model import Measurement
 from datacube_stats.statistics import Statistic
 
+from ..precision import as_float
+
 
 class BaseMetrics(Statistic):
     """datacube-stats statistics base class to generate max, min, mean and median metrics
@@ -22,7 +24,8 @@ class BaseMetrics(Statistic):
 
         band_name (str): band to be appliend in temporal `metric_name`
 
-        factor (int): factor applied to divided data cube values
+        factor (int): factor applied to divided data cube values. The temporal metrics are linear in the data cube
+        values, so the factor is not applied (kept for compatibility with existing configurations)
     """
 
     def __init__(self, band_name: str, metric_name: str, factor=10000):
@@ -33,7 +36,7 @@ class BaseMetrics(Statistic):
     def compute(self, data: xarray.Dataset) -> xarray.Dataset:
         return xarray.Dataset({
             f"{self._band_name}_{self._metric_name}": getattr(
-                getattr(data, self._band_name) / self._factor, self._metric_name)(dim='time') * self._factor
+                as_float(data[self._band_name]), self._metric_name)(dim='time')
         }, attrs={"crs": data.crs})
 
     def measurements(self, input_measurements: List[Dict]) -> List:
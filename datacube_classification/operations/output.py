@@ -0,0 +1,138 @@
+#
+# This file is part of datacube-classification
+# Copyright (C) 2021 INPE.
+#
+# datacube-classification Library is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+#
+"""datacube-stats output construction module"""
+
+import threading
+from collections import OrderedDict
+from typing import List, Dict
+
+import numpy as np
+import xarray
+
+# coordinates shared between the operations applied over the same block
+_COORDINATES_CACHE_SIZE = 8
+_coordinates_cache = OrderedDict()
+_coordinates_lock = threading.Lock()
+
+
+def block_coordinates(data: xarray.Dataset, coordinates: str = "1d") -> dict:
+    """Creates the coordinates of an output block.
+
+    The coordinates are cached by block extent, so all operations applied over the same block (in one datacube-stats
+    run, including threaded workers) share the same coordinate objects. With `coordinates="2d"` the `x_coordinate`
+    and `y_coordinate` variables are added as read-only broadcast views of the 1-D coordinates, so no dense grid is
+    allocated.
+
+    Args:
+        data (xarray.Dataset): input block (with `x` and `y` dimensions)
+
+        coordinates (str): `1d` to use only the `x` and `y` coordinates or `2d` to also add the `x_coordinate` and
+        `y_coordinate` (as created with np.meshgrid)
+    Returns:
+        dict: coordinates to be used in a xarray.Dataset with `y` and `x` dimensions
+    """
+
+    if coordinates not in ("1d", "2d"):
+        raise ValueError(f"Invalid coordinates type: {coordinates} (use `1d` or `2d`)")
+
+    x = data.x.values
+    y = data.y.values
+
+    key = (coordinates, x.tobytes(), y.tobytes())
+    with _coordinates_lock:
+        if key in _coordinates_cache:
+            _coordinates_cache.move_to_end(key)
+            return _coordinates_cache[key]
+
+    coords = {
+        "x": ("x", x),
+        "y": ("y", y)
+    }
+
+    if coordinates == "2d":
+        shape = (y.shape[0], x.shape[0])
+
+        coords["x_coordinate"] = (["y", "x"], np.broadcast_to(x[np.newaxis, :], shape))
+        coords["y_coordinate"] = (["y", "x"], np.broadcast_to(y[:, np.newaxis], shape))
+
+    with _coordinates_lock:
+        # another thread may have created the same coordinates in the meantime
+        coords = _coordinates_cache.setdefault(key, coords)
+        _coordinates_cache.move_to_end(key)
+
+        if len(_coordinates_cache) > _COORDINATES_CACHE_SIZE:
+            _coordinates_cache.popitem(last=False)
+    return coords
+
+
+class OutputBuilder:
+    """Output Dataset builder used by the datacube-stats operations of this package.
+
+    For each output measurement, an array with the measurement `dtype` (filled with the measurement `nodata`) is
+    allocated. The results of the operation are written directly in these arrays, avoiding intermediary copies.
+
+    Args:
+        data (xarray.Dataset): input block (with `x` and `y` dimensions)
+
+        measurements (list): output measurements (as returned by `Statistic.measurements`)
+
+        coordinates (str): coordinates type (see `block_coordinates`)
+    """
+
+    def __init__(self, data: xarray.Dataset, measurements: List[Dict], coordinates: str = "1d"):
+        self._crs = data.crs
+        self._shape = (data.sizes["y"], data.sizes["x"])
+        self._coords = block_coordinates(data, coordinates)
+
+        self._measurements = OrderedDict(
+            (measurement["name"], np.full(self._shape, measurement["nodata"], dtype=measurement["dtype"]))
+            for measurement in measurements
+        )
+
+    @property
+    def shape(self):
+        """tuple: output block shape (y, x)"""
+        return self._shape
+
+    @property
+    def names(self):
+        """list: output measurements names"""
+        return list(self._measurements.keys())
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self._measurements[name]
+
+    def write(self, name: str, values):
+        """Writes values into the preallocated measurement array.
+
+        The values are reshaped to the block shape and cast to the measurement dtype. NaN values are kept as nodata.
+
+        Args:
+            name (str): measurement name
+
+            values (np.array or xarray.DataArray): values with `y * x` elements
+        """
+
+        values = np.asarray(values).reshape(self._shape)
+
+        where = True
+        if np.issubdtype(values.dtype, np.floating):
+            where = ~np.isnan(values)
+
+        np.copyto(self._measurements[name], values, casting="unsafe", where=where)
+
+    def build(self) -> xarray.Dataset:
+        """Creates the output Dataset
+
+        Returns:
+            xarray.Dataset: Dataset with all measurements
+        """
+
+        return xarray.Dataset({
+            name: (["y", "x"], values) for name, values in self._measurements.items()
+        }, coords=self._coords, attrs={"crs": self._crs})
@@ -13,12 +13,13 @@ from typing import List, Dict
 
 import xarray
 import rioxarray  # used in shadow to export tif from xarray (do not remove!)
-import numpy as np
 import rasterio as rio
 
 from datacube.model import Measurement
 from datacube_stats.statistics import Statistic
 
+from .output import OutputBuilder
+
 import tempfile
 import rpy2.robjects
 from rpy2.robjects.packages import importr
@@ -41,15 +42,19 @@ class SpatioTemporalLinearMixtureModel(Statistic):
         represents each endmembers)
 
         factor (int): factor applied to divided data cube values
+
+        coordinates (str): output coordinates: `1d` (only `x` and `y`) or `2d` (also the `x_coordinate` and
+        `y_coordinate`, see `datacube_classification.operations.output.block_coordinates`)
     See:
         https://www.sciencedirect.com/science/article/abs/pii/S0034425717300500?casa_token=HgXkzGkp2ysAAAAA:gaD0i7DWvbsGS86fNJJ04cAJ-vO7XM-GJAMvEbBs0t6gWArBtPfASvjG5vkXZMfPwWv_TAiky8ii#s0035
     """
 
-    def __init__(self, bands: list, endmembers_file: str, factor=10000):
+    def __init__(self, bands: list, endmembers_file: str, factor=10000, coordinates: str = "2d"):
         self._bands = bands
         self._endmembers = r_utils.read_csv(endmembers_file, header=False)
 
         self._factor = factor
+        self._coordinates = coordinates
 
     def compute(self, data: xarray.Dataset) -> xarray.Dataset:
         stack_bands = []
@@ -75,19 +80,13 @@ class SpatioTemporalLinearMixtureModel(Statistic):
         )
 
         # load fractions and export
-        arr = rio.open(mesma_raster_out).read()
-        x, y = np.meshgrid(data.x.values, data.y.values)
+        output = OutputBuilder(data, self.measurements([]), self._coordinates)
+        with rio.open(mesma_raster_out) as fractions:
+            for band_index, measurement in enumerate(output.names, start=1):
+                output.write(measurement, fractions.read(band_index))
 
         shutil.rmtree(tmp_dir)
-        return xarray.Dataset({
-            "GROUND_FRACTION": (["x", "y"], arr[0, :, :]),
-            "VEGETATION_FRACTION": (["x", "y"], arr[1, :, :]),
-            "WATER_FRACTION": (["x", "y"], arr[2, :, :])
-        },
-            coords={
-                "x_coordinate": (["x", "y"], x),
-                "y_coordinate": (["x", "y"], y)
-            }, attrs={"crs": data.crs})
+        return output.build()
 
     def measurements(self, input_measurements: List[Dict]) -> List:
         return [
@@ -0,0 +1,124 @@
+#
+# This file is part of datacube-classification
+# Copyright (C) 2021 INPE.
+#
+# datacube-classification Library is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+#
+"""numeric precision and scaling policy module"""
+
+import os
+
+import numpy as np
+
+PRECISION_POLICIES = ("float64", "float32", "int")
+
+_precision = os.environ.get("DATACUBE_CLASSIFICATION_PRECISION", "float64")
+
+
+def _check_policy(policy: str):
+    if policy not in PRECISION_POLICIES:
+        raise ValueError(f"Invalid precision policy: {policy} (use one of {', '.join(PRECISION_POLICIES)})")
+    return policy
+
+
+def set_precision(policy: str):
+    """Defines the precision policy used by all package operations.
+
+    The available policies are:
+
+        - `float64`: values are scaled using float64 (default);
+        - `float32`: values are scaled using float32, halving the memory used by each block;
+        - `int`: values are kept in the data cube integer-scaled representation (the scale factor is not applied).
+          This can be used with models trained on raw values. Operations that need real values use float32.
+
+    The initial policy can also be defined with the `DATACUBE_CLASSIFICATION_PRECISION` environment variable.
+
+    Args:
+        policy (str): precision policy name
+    """
+
+    global _precision
+    _precision = _check_policy(policy)
+
+
+def get_precision() -> str:
+    """Returns the precision policy in use
+
+    Returns:
+        str: precision policy name
+    """
+    return _check_policy(_precision)
+
+
+def float_dtype(precision: str = None) -> np.dtype:
+    """Returns the floating point dtype used by the precision policy
+
+    Args:
+        precision (str): precision policy name. If not defined, the policy in use is considered
+    Returns:
+        np.dtype: floating point dtype
+    """
+
+    precision = _check_policy(precision or get_precision())
+    return np.dtype(np.float64 if precision == "float64" else np.float32)
+
+
+def as_float(values, precision: str = None):
+    """Casts the values to the floating point dtype of the precision policy
+
+    Args:
+        values (np.array, pd.DataFrame, xarray.DataArray or xarray.Dataset): values to be cast
+
+        precision (str): precision policy name. If not defined, the policy in use is considered
+    Returns:
+        values with the policy floating point dtype
+    """
+
+    return values.astype(float_dtype(precision))
+
+
+def to_reflectance(values, factor, precision: str = None):
+    """Divides the values by `factor` in the floating point dtype of the precision policy.
+
+    This function always applies the scale factor. It is used by operations that depends on the real values
+    (e.g. non-linear spectral indices).
+
+    Args:
+        values (np.array, pd.DataFrame, xarray.DataArray or xarray.Dataset): values to be scaled
+
+        factor (number): scale factor
+
+        precision (str): precision policy name. If not defined, the policy in use is considered
+    Returns:
+        values divided by `factor`
+    """
+
+    dtype = float_dtype(precision)
+
+    values = values.astype(dtype)
+    values /= dtype.type(factor)
+    return values
+
+
+def scale(values, factor, precision: str = None):
+    """Applies the scale factor following the precision policy.
+
+    With the `int` policy, the values are returned unchanged. Otherwise, the values are divided by `factor` in the
+    policy floating point dtype.
+
+    Args:
+        values (np.array, pd.DataFrame, xarray.DataArray or xarray.Dataset): values to be scaled
+
+        factor (number): scale factor
+
+        precision (str): precision policy name. If not defined, the policy in use is considered
+    Returns:
+        scaled values
+    """
+
+    precision = _check_policy(precision or get_precision())
+
+    if precision == "int" or factor is None:
+        return values
+    return to_reflectance(values, factor, precision)
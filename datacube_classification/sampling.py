@@ -0,0 +1,119 @@
+#
+# This file is part of datacube-classification
+# Copyright (C) 2021 INPE.
+#
+# datacube-classification Library is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+#
+"""training samples selection module"""
+
+from typing import Iterable, Union
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+_ORDER_COL = "_sample_order"
+_KEY_COL = "_sample_key"
+_RANK_COL = "_sample_rank"
+
+
+def _class_cap(label, max_per_class, proportions, total) -> float:
+    """Returns the maximum number of samples selected for `label`"""
+
+    if proportions is not None:
+        return int(round(proportions.get(label, 0) * total))
+
+    if isinstance(max_per_class, dict):
+        return max_per_class.get(label, np.inf)
+    return max_per_class
+
+
+def _reduce_reservoir(reservoir: gpd.GeoDataFrame, label_col: str, max_per_class, proportions, total,
+                      spread_cell_size) -> gpd.GeoDataFrame:
+    """Keeps, for each class, the samples with the lowest priority (spatial rank and random key)"""
+
+    rank = 0
+    if spread_cell_size:
+        # samples in less represented cells are preferred
+        cells = [reservoir[label_col],
+                 (reservoir.geometry.x // spread_cell_size).rename("_cell_x"),
+                 (reservoir.geometry.y // spread_cell_size).rename("_cell_y")]
+        rank = reservoir.groupby(cells)[_KEY_COL].rank(method="first")
+
+    reservoir = reservoir.assign(**{_RANK_COL: rank}).sort_values([_RANK_COL, _KEY_COL])
+
+    caps = {
+        label: _class_cap(label, max_per_class, proportions, total) for label in reservoir[label_col].unique()
+    }
+    return reservoir[reservoir.groupby(label_col).cumcount() < reservoir[label_col].map(caps)]
+
+
+def stratified_sample(samples: Union[gpd.GeoDataFrame, Iterable[gpd.GeoDataFrame]], label_col="label",
+                      max_per_class: Union[int, dict] = None, proportions: dict = None, total: int = None,
+                      spread_cell_size: float = None, random_state: int = None) -> gpd.GeoDataFrame:
+    """Selects a stratified (by label) subset of the samples, to be used before the time series extraction.
+
+    This function uses a per-class reservoir sampling, so `samples` can be a stream of GeoDataFrame chunks larger
+    than the memory (e.g. read with `geopandas.read_file(..., rows=slice(...))`). Only the selected samples and one
+    chunk are kept in memory. The selection is reproducible for the same `random_state` and chunks.
+
+    Chunks read separately usually have overlapping indexes (e.g. all starting at 0), so, with a stream of chunks, the
+    selected samples are indexed by their position in the stream (e.g. the row in the file read in chunks). With a
+    single GeoDataFrame, its (unique) index is kept.
+
+    Args:
+        samples (gpd.GeoDataFrame or iterable): samples (points) or an iterable of samples chunks
+
+        label_col (str): Column in `samples` where associated label is
+
+        max_per_class (int or dict): maximum number of samples of each class (a single value or a value by label).
+        Labels not defined in the dict are not limited
+
+        proportions (dict): target proportion of each label (labels not defined are not selected). Requires `total`
+
+        total (int): total number of samples selected with `proportions`
+
+        spread_cell_size (float): if defined, samples are spread out spatially, preferring samples in grid cells
+        (with this size, in `samples` CRS units) less represented in each class
+
+        random_state (int): seed of the random selection
+    Returns:
+        gpd.GeoDataFrame: selected samples (in `samples` order)
+    Raises:
+        ValueError: if the arguments are invalid, there are no samples or a single GeoDataFrame has a duplicated index
+    """
+
+    if max_per_class is None and proportions is None:
+        raise ValueError("`max_per_class` or `proportions` must be defined")
+
+    if proportions is not None and total is None:
+        raise ValueError("`total` must be defined to select samples using `proportions`")
+
+    stream = not isinstance(samples, pd.DataFrame)
+    if not stream:
+        if samples.index.has_duplicates:
+            raise ValueError("The samples index must be unique")
+        samples = [samples]
+
+    rng = np.random.default_rng(random_state)
+
+    reservoir = None
+    offset = 0
+    for chunk in samples:
+        chunk = chunk.assign(**{
+            _ORDER_COL: np.arange(offset, offset + len(chunk)),
+            _KEY_COL: rng.random(len(chunk))
+        })
+        offset += len(chunk)
+
+        reservoir = chunk if reservoir is None else pd.concat([reservoir, chunk])
+        reservoir = _reduce_reservoir(reservoir, label_col, max_per_class, proportions, total, spread_cell_size)
+
+    if reservoir is None:
+        raise ValueError("No samples to select")
+
+    reservoir = reservoir.sort_values(_ORDER_COL)
+    if stream:
+        reservoir.index = pd.Index(reservoir[_ORDER_COL].values)
+    return reservoir.drop(columns=[_ORDER_COL, _KEY_COL, _RANK_COL])
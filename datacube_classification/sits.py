@@ -7,13 +7,19 @@
 #
 """satellite image time series (sits) operations module"""
 
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Callable, Dict
+
 import geopandas as gpd
 import numpy as np
 import pandas as pd
 import xarray
 
+from datacube_classification.cache import PreprocessingCache, preprocess
 from datacube_classification.cloud import cloud_mask
 from datacube_classification.interp import datacube_temporal_interpolate
+from datacube_classification.precision import scale
 
 
 def _get_data(datacube, cols, rows, quality_band_name=None) -> pd.DataFrame:
@@ -66,7 +72,7 @@ def _get_data(datacube, cols, rows, quality_band_name=None) -> pd.DataFrame:
 
 
 def datacube_get_sits(datacube, geometry_location: gpd.GeoDataFrame, label_col="label", quality_band_name: str = None,
-                      factor=10000):
+                      factor=10000, cache: PreprocessingCache = None):
     """Retrieves the time series, for each attribute, associated with the `rows` and `cols` that are being specified.
 
     This function retrieves the time series for each specified in a GeoDataFrame
@@ -82,7 +88,10 @@ def datacube_get_sits(datacube, geometry_location: gpd.GeoDataFrame, label_col="
 
         quality_band_name (str): name of dimension in `datacube` where cloud mask is in
 
-        factor (int): factor to be applied in time-series extracted values
+        factor (int): factor to be applied in time-series extracted values (see `datacube_classification.precision`)
+
+        cache (PreprocessingCache): preprocessed data cubes cache. If defined, the whole `datacube` is cloud masked and
+        interpolated (or read from the cache) before the extraction
     Returns:
         pd.DataFrame: Table with extracted time-series in a attribute-way
     See:
@@ -90,13 +99,229 @@ def datacube_get_sits(datacube, geometry_location: gpd.GeoDataFrame, label_col="
         in SITS R Package
     """
 
+    if cache is not None and quality_band_name:
+        datacube = cache.get(datacube, quality_band_name)
+        quality_band_name = None
+
     geometry_location = geometry_location.copy().to_crs(datacube.crs)
-    return (_get_data(datacube, geometry_location.geometry.x, geometry_location.geometry.y,
-                      quality_band_name) / factor) \
+    return scale(_get_data(datacube, geometry_location.geometry.x, geometry_location.geometry.y,
+                           quality_band_name), factor) \
         .assign(label=geometry_location[label_col])
 
 
-def datacube_to_sits(datacube, quality_band_name: str = None, factor=10000):
+def _datacube_footprint(datacube, crs):
+    """Creates the footprint of a data cube (pixels border) in a given CRS
+
+    Args:
+        datacube (xarray.Dataset): data cube
+
+        crs (object): output footprint CRS
+    Returns:
+        shapely.geometry.Polygon: data cube footprint
+    """
+    from shapely.geometry import box
+
+    x = datacube.x.values
+    y = datacube.y.values
+
+    xres = abs(x[1] - x[0]) / 2 if x.shape[0] > 1 else 0
+    yres = abs(y[1] - y[0]) / 2 if y.shape[0] > 1 else 0
+
+    footprint = box(x.min() - xres, y.min() - yres, x.max() + xres, y.max() + yres)
+    return gpd.GeoSeries([footprint], crs=datacube.crs).to_crs(crs).iloc[0]
+
+
+def _retry(function: Callable, retries: int, retry_delay: float):
+    """Calls `function`, retrying it up to `retries` times on I/O errors (`OSError`, including connection and
+    timeout errors), waiting `retry_delay * 2 ** attempt` seconds before each retry"""
+
+    for attempt in range(retries + 1):
+        try:
+            return function()
+        except OSError:
+            if attempt == retries:
+                raise
+            time.sleep(retry_delay * 2 ** attempt)
+
+
+def _datacube_get_sits_task(datacube_opener: Callable, geometry_location: gpd.GeoDataFrame, footprint, chunk_size: int,
+                            retries: int, retry_delay: float, **kwargs):
+    """Extracts the time series of `geometry_location` from one data cube.
+
+    The data cube is opened once and all samples chunks are extracted from it. If `footprint` is not defined, it is
+    created from the opened data cube and only the samples inside it are extracted.
+
+    Returns:
+        tuple: extracted time series (with the `geometry_location` index) and the data cube timeline
+    """
+
+    datacube = _retry(datacube_opener, retries, retry_delay)
+
+    # the cache is queried once for the whole data cube, not once per chunk
+    cache = kwargs.pop("cache", None)
+    if cache is not None and kwargs.get("quality_band_name"):
+        datacube = cache.get(datacube, kwargs["quality_band_name"])
+        kwargs["quality_band_name"] = None
+
+    if footprint is None:
+        footprint = _datacube_footprint(datacube, geometry_location.crs)
+        geometry_location = geometry_location[geometry_location.geometry.intersects(footprint)]
+
+    output = []
+    for start in range(0, len(geometry_location), chunk_size):
+        chunk = geometry_location.iloc[start:start + chunk_size]
+        output.append(
+            _retry(lambda: datacube_get_sits(datacube, chunk.reset_index(drop=True), **kwargs), retries, retry_delay)
+            .set_index(chunk.index)
+        )
+
+    sits = pd.concat(output) if output else None
+    return sits, datacube.time.values
+
+
+def datacubes_get_sits(datacubes: Dict[str, Callable], geometry_location: gpd.GeoDataFrame, label_col="label",
+                       quality_band_name: str = None, factor=10000, footprints: dict = None, products: dict = None,
+                       max_workers: int = 4, executor: str = "thread", chunk_size: int = 1000, retries: int = 2,
+                       retry_delay: float = 1, progress: Callable = None, cache: PreprocessingCache = None):
+    """Retrieves the time series of samples distributed across multiple data cubes (e.g. tiles of several products).
+
+    The data cubes are processed concurrently, using a bounded thread or process pool. Each data cube is opened once,
+    in its worker, and its samples are extracted (with `datacube_get_sits`) in chunks of `chunk_size` samples.
+
+    The data cubes of the same product (e.g. its tiles) must have the same bands and timeline, since the time series
+    columns are positional (e.g. `band0`, `band1`, ...). Each sample is extracted from the first data cube of the
+    product that contains it. When the data cubes belong to multiple products (e.g. CB4 and LC8 data cubes with
+    different time ranges), the time series of each product are merged by sample and their columns are prefixed
+    with the product name (e.g. `CB4_band0`).
+
+    Args:
+        datacubes (dict): data cube openers by name. Each opener is a callable without arguments that returns
+        a xarray.Dataset (e.g. `functools.partial(xarray.open_zarr, path)` or a function that calls `Datacube.load`).
+        With `executor="process"` the openers must be picklable
+
+        geometry_location (gpd.GeoDataFrame): GeoDataFrame with geometry column. Time-series will be extracted for each
+        geometry location
+
+        label_col (str): Column in `geometry_location` where associated label is
+
+        quality_band_name (str): name of dimension in data cubes where cloud mask is in
+
+        factor (int): factor to be applied in time-series extracted values
+
+        footprints (dict): data cubes footprints (shapely geometries in `geometry_location` CRS) by name. Each sample is
+        assigned to the first data cube of each product (see `products`) whose footprint contains it. If not defined,
+        footprints are created from the opened data cubes coordinates and samples in overlapping areas are extracted
+        from all data cubes that contain them (only the first one of each product is returned)
+
+        products (dict): product name of each data cube (by name). If not defined, data cubes with the same bands and
+        timeline are considered the same product, named after its first data cube (in `datacubes` order). It must be
+        defined to use `footprints` with multiple products
+
+        max_workers (int): maximum number of concurrent extractions
+
+        executor (str): `thread` or `process`
+
+        chunk_size (int): maximum number of samples extracted at once from a data cube
+
+        retries (int): number of retries of each data cube opening or chunk extraction failed with an I/O error
+
+        retry_delay (float): delay (in seconds) before the first retry. It is doubled after each retry
+
+        progress (callable): function called as `progress(done, total)` after each processed data cube
+
+        cache (PreprocessingCache): preprocessed data cubes cache (see `datacube_get_sits`)
+    Returns:
+        pd.DataFrame: Table with extracted time-series in a attribute-way, in `geometry_location` order and with its
+        index. Samples outside all data cubes footprints are not returned. With multiple products, the columns of a
+        product not covering a sample are NaN
+    Raises:
+        ValueError: if data cubes of the same product have different bands or timelines
+    """
+
+    executors = {"thread": ThreadPoolExecutor, "process": ProcessPoolExecutor}
+    if executor not in executors:
+        raise ValueError(f"Invalid executor: {executor} (use `thread` or `process`)")
+
+    samples = geometry_location.reset_index(drop=True)
+    names = list(datacubes.keys())
+
+    tasks = {name: samples for name in names}
+    if footprints is not None:
+        # assign each sample to the first data cube (of each product) that contains it
+        tasks = {}
+        assigned = {}
+        for name in names:
+            product = products[name] if products is not None else None
+            unassigned = ~assigned.get(product, np.zeros(len(samples), dtype=bool))
+
+            in_footprint = unassigned & samples.geometry.intersects(footprints[name]).values
+            assigned[product] = ~unassigned | in_footprint
+
+            if in_footprint.any():
+                tasks[name] = samples[in_footprint]
+
+    output = {}
+    timelines = {}
+    with executors[executor](max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(_datacube_get_sits_task, datacubes[name], task_samples,
+                        footprints[name] if footprints is not None else None, chunk_size, retries, retry_delay,
+                        label_col=label_col, quality_band_name=quality_band_name, factor=factor, cache=cache): name
+            for name, task_samples in tasks.items()
+        }
+
+        for done, future in enumerate(as_completed(futures), start=1):
+            sits, timeline = future.result()
+            if sits is not None:
+                output[futures[future]] = sits
+                timelines[futures[future]] = timeline
+
+            if progress:
+                progress(done, len(tasks))
+
+    # data cubes by product, in `datacubes` order
+    groups = {}
+    for name in filter(lambda name: name in output, names):
+        if products is not None:
+            product = products[name]
+        else:
+            # data cubes with the same bands and timeline are considered the same product
+            product = next((
+                product for product, group in groups.items()
+                if output[group[0]].columns.equals(output[name].columns) and
+                np.array_equal(timelines[group[0]], timelines[name])
+            ), name)
+        groups.setdefault(product, []).append(name)
+
+    merged = []
+    for product, group in groups.items():
+        # time series columns are positional, so they must be the same in all data cubes of a product
+        for name in group[1:]:
+            if not output[name].columns.equals(output[group[0]].columns) or \
+                    not np.array_equal(timelines[name], timelines[group[0]]):
+                raise ValueError(f"Data cubes `{group[0]}` and `{name}` of product `{product}` have different bands "
+                                 f"or timelines")
+
+        # samples extracted from multiple data cubes are kept from the first one
+        sits = pd.concat([output[name] for name in group])
+        merged.append(sits[~sits.index.duplicated(keep="first")])
+
+    if not merged:
+        return pd.DataFrame(columns=["label"], index=geometry_location.index[:0])
+
+    if len(merged) == 1:
+        output = merged[0].sort_index()
+    else:
+        output = pd.concat([
+            sits.drop(columns="label").add_prefix(f"{product}_") for product, sits in zip(groups.keys(), merged)
+        ], axis=1).sort_index()
+        output["label"] = samples.loc[output.index, label_col].values
+
+    output.index = geometry_location.index[output.index]
+    return output
+
+
+def datacube_to_sits(datacube, quality_band_name: str = None, factor=10000, cache: PreprocessingCache = None):
     """Retrieves and organizes the time series associated with all pixels in a data cube.
 
     This function is optimized for collecting time series associated with all pixels of a data cube. For each pixel
@@ -106,18 +331,18 @@ def datacube_to_sits(datacube, quality_band_name: str = None, factor=10000):
     Args:
         datacube (xarray.Dataset): data cube used to extract time series
 
-        factor (int): factor to be applied in time-series extracted values
+        factor (int): factor to be applied in time-series extracted values (see `datacube_classification.precision`)
 
         quality_band_name (str): name of dimension in `datacube` where cloud mask is in
+
+        cache (PreprocessingCache): preprocessed data cubes cache
     Returns:
         pd.DataFrame: Table with extracted time-series in a attribute-way
     """
 
     # remove cloud shadow (2) and cloud (4) from mask
     if quality_band_name:
-        datacube = datacube_temporal_interpolate(
-            cloud_mask(datacube, quality_band_name)
-        )
+        datacube = preprocess(datacube, quality_band_name, cache)
 
     # get dimensions
     xdim = datacube.dims["x"]
@@ -129,31 +354,92 @@ def datacube_to_sits(datacube, quality_band_name: str = None, factor=10000):
         for band in data_bands for x in range(len(datacube.time))
     ]
 
+    # scaling is applied on each band array to avoid a float64 copy of the whole table
     return pd.concat([
         pd.DataFrame(
-            datacube[band].values.reshape(-1, xdim * ydim)
+            scale(datacube[band].values.reshape(-1, xdim * ydim), factor)
         ) for band in data_bands
     ]).assign(index=index) \
-               .set_index("index").T \
-               .reset_index(drop=True) / factor
+        .set_index("index").T \
+        .reset_index(drop=True)
+
+
+def _plot_ts_aggregated(ts: pd.DataFrame, band_names: list, timeline: list, label_col: str, max_samples: int,
+                        random_state: int, **kwargs):
+    """Plot time series of multiple bands using per-class quantile envelopes and a single line collection per band
+
+    See `plot_ts` for the arguments description.
+    """
+    import matplotlib.dates as mdates
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import LineCollection
+
+    dates = mdates.date2num(pd.to_datetime(timeline))
+    columns = {band: [f"{band}{x}" for x in range(len(timeline))] for band in band_names}
+    all_columns = [column for band in band_names for column in columns[band]]
 
+    # median and quartiles of all classes and bands in one groupby
+    envelopes = ts.groupby(label_col)[all_columns].quantile([0.25, 0.5, 0.75])
+    rng = np.random.default_rng(random_state)
 
-def plot_ts(ts: pd.DataFrame, band_name: str, timeline: list, label_col: str = "label", **kwargs):
+    figures = []
+    for group_name, group_data in ts.groupby(label_col):
+        fig, axes = plt.subplots(len(band_names), 1, squeeze=False, sharex=True, **kwargs)
+
+        # raw series (optionally downsampled)
+        values = group_data[all_columns].to_numpy()
+        if max_samples and values.shape[0] > max_samples:
+            values = values[rng.choice(values.shape[0], max_samples, replace=False)]
+
+        for band_index, (band, ax) in enumerate(zip(band_names, axes[:, 0])):
+            band_values = values[:, band_index * len(dates):(band_index + 1) * len(dates)]
+
+            segments = np.empty((band_values.shape[0], len(dates), 2))
+            segments[:, :, 0] = dates
+            segments[:, :, 1] = band_values
+            ax.add_collection(LineCollection(segments, colors='#819bb1', linewidths=0.2))
+
+            band_envelopes = envelopes.loc[group_name, columns[band]]
+            ax.plot(dates, band_envelopes.loc[0.5].values, color='#b16240', linewidth=1.5)
+            ax.plot(dates, band_envelopes.loc[0.25].values, color='#b19540', linewidth=1.5)
+            ax.plot(dates, band_envelopes.loc[0.75].values, color='#b19540', linewidth=1.5)
+
+            ax.autoscale()
+            ax.xaxis_date()
+            ax.set_title(f"Samples ({group_data.shape[0]}) for class {group_name} in band = {band}")
+        figures.append(fig)
+    return figures
+
+
+def plot_ts(ts: pd.DataFrame, band_name, timeline: list, label_col: str = "label", aggregated: bool = False,
+            max_samples: int = None, random_state: int = None, **kwargs):
     """Plot specific band time series
 
     Args:
         ts (pd.DataFrame): Table with time series to be plotted (as is in `datacube_get_sits` format)
 
-        band_name (str): band name
+        band_name (str or list): band name. With `aggregated=True`, a list of bands can be used (one subplot per band)
 
         timeline (list): samples timeline
 
         label_col (str): column in table where labels is in
 
-        kwargs (dict): args to matplotlib.pyplot.figure function
+        aggregated (bool): aggregated mode, for large sample sets. The per-class median and quartiles are computed in
+        one vectorized groupby and the raw series are drawn as a single line collection
+
+        max_samples (int): maximum number of raw series drawn per class in aggregated mode (random downsampling)
+
+        random_state (int): seed used in the downsampling
+
+        kwargs (dict): args to matplotlib.pyplot.figure function (matplotlib.pyplot.subplots in aggregated mode)
     returns:
-        matplotlib.figure.Figure: generated figure
+        list: generated figures (matplotlib.figure.Figure), one per class. In aggregated mode, each figure has one
+        subplot per band
     """
+    if aggregated:
+        band_names = [band_name] if isinstance(band_name, str) else list(band_name)
+        return _plot_ts_aggregated(ts, band_names, timeline, label_col, max_samples, random_state, **kwargs)
+
     import matplotlib.pyplot as plt
 
     labels_groups = ts.groupby(label_col)
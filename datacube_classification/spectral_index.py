@@ -5,10 +5,16 @@
 # datacube-classification Library is free software; you can redistribute it and/or modify it
 # under the terms of the MIT License; see LICENSE file for more details.
 #
-"""datacube-stats spectral index module"""
+"""datacube-stats spectral index module
+
+The indices receive the reflectance values (as scaled by `datacube_classification.operations.cube.MeasurementGenerator`)
+and are computed in the floating point dtype of `datacube_classification.precision`.
+"""
 
 import xarray
 
+from .precision import as_float
+
 
 def pvr(data: xarray.DataArray, red_band: str, green_band: str):
     """function to generate PVR index
@@ -22,8 +28,8 @@ def pvr(data: xarray.DataArray, red_band: str, green_band: str):
         https://www.indexdatabase.de/db/i-single.php?id=484
     """
 
-    red = data[red_band] / 10000
-    green = data[green_band] / 10000
+    red = as_float(data[red_band])
+    green = as_float(data[green_band])
 
     return (green - red) / (green + red)
 
@@ -40,8 +46,8 @@ def gndvi(data: xarray.DataArray, nir_band: str, green_band: str):
         https://www.indexdatabase.de/db/i-single.php?id=28
     """
 
-    nir = data[nir_band] / 10000
-    green = data[green_band] / 10000
+    nir = as_float(data[nir_band])
+    green = as_float(data[green_band])
 
     return (nir - green) / (nir + green)
 
@@ -58,8 +64,8 @@ def gemi(data: xarray.DataArray, red_band: str, nir_band: str):
         https://www.indexdatabase.de/db/i-single.php?id=25
     """
 
-    nir = data[nir_band] / 10000
-    red = data[red_band] / 10000
+    nir = as_float(data[nir_band])
+    red = as_float(data[red_band])
 
     epsilon = (
                       2 * ((nir ** 2) - (red ** 2)) + 1.5 * nir * red
@@ -80,7 +86,7 @@ def ndwi2(data: xarray.DataArray, nir_band: str, green_band: str):
         https://www.indexdatabase.de/db/i-single.php?id=546
     """
 
-    nir = data[nir_band] / 10000
-    green = data[green_band] / 10000
+    nir = as_float(data[nir_band])
+    green = as_float(data[green_band])
 
     return (green - nir) / (green + nir)
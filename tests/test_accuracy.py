@@ -0,0 +1,141 @@
+#
+# This file is part of datacube-classification
+# Copyright (C) 2021 INPE.
+#
+# datacube-classification Library is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+#
+"""accuracy assessment tests"""
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+import rasterio as rio
+from rasterio.transform import from_origin
+
+from datacube_classification.accuracy import accuracy_assessment, area_weighted_accuracy, class_area, \
+    confusion_matrix
+
+
+def _tile(path, west, values, nodata=-9999):
+    """Writes a classification tile with 1 degree pixels and the top at latitude 2"""
+    values = np.array(values, dtype="int16")
+
+    with rio.open(path, "w", driver="GTiff", width=values.shape[1], height=values.shape[0], count=1, dtype="int16",
+                  crs="EPSG:4326", transform=from_origin(west, 2, 1, 1), nodata=nodata) as dst:
+        dst.write(values, 1)
+    return str(path)
+
+
+@pytest.fixture
+def tiles(tmp_path):
+    return [
+        # bottom row is nodata
+        _tile(tmp_path / "tile1.tif", 0, [[1, 2], [-9999, -9999]]),
+        # overlaps the second column of the first tile
+        _tile(tmp_path / "tile2.tif", 1, [[2, 2], [2, 2]])
+    ]
+
+
+@pytest.fixture
+def reference():
+    return gpd.GeoDataFrame({"label": [1, 1, 1, 2, 2, 1]}, geometry=gpd.points_from_xy(
+        [0.5, 1.5, 0.5, 1.5, 2.5, 5.0], [1.5, 1.5, 0.5, 0.5, 0.5, 5.0]
+    ), crs="EPSG:4326")
+
+
+def test_area_weighted_accuracy_olofsson_example():
+    """Numerical example of Olofsson et al. (2014), https://doi.org/10.1016/j.rse.2014.02.015"""
+
+    classes = [1, 2, 3, 4]
+    matrix = pd.DataFrame([
+        [66, 0, 5, 4],
+        [0, 55, 8, 12],
+        [1, 0, 153, 11],
+        [2, 1, 9, 313]
+    ], index=classes, columns=classes)
+    mapped_area = pd.Series([200000, 150000, 3200000, 6450000], index=classes)
+
+    result = area_weighted_accuracy(matrix, mapped_area)
+
+    assert result["overall_accuracy"] == pytest.approx(0.947, abs=5e-4)
+    np.testing.assert_allclose(result["users_accuracy"].values, [0.88, 0.73, 0.93, 0.96], atol=5e-3)
+    np.testing.assert_allclose(result["producers_accuracy"].values, [0.75, 0.85, 0.93, 0.96], atol=5e-3)
+    np.testing.assert_allclose(result["area"].values, [235086, 129846, 3175221, 6459846], rtol=1e-5)
+    assert result["area"].sum() == pytest.approx(mapped_area.sum())
+
+
+def test_area_weighted_accuracy_two_classes():
+    matrix = pd.DataFrame([[8, 2], [1, 9]], index=[1, 2], columns=[1, 2])
+    mapped_area = pd.Series([30.0, 70.0], index=[1, 2])
+
+    result = area_weighted_accuracy(matrix, mapped_area)
+
+    # cell proportions: [[0.24, 0.06], [0.07, 0.63]]
+    assert result["overall_accuracy"] == pytest.approx(0.87)
+    np.testing.assert_allclose(result["users_accuracy"].values, [0.8, 0.9])
+    np.testing.assert_allclose(result["producers_accuracy"].values, [0.24 / 0.31, 0.63 / 0.69])
+    np.testing.assert_allclose(result["area"].values, [31, 69])
+
+
+def test_area_weighted_accuracy_perfect_map():
+    matrix = pd.DataFrame([[10, 0], [0, 5]], index=[1, 2], columns=[1, 2])
+    mapped_area = pd.Series([25.0, 75.0], index=[1, 2])
+
+    result = area_weighted_accuracy(matrix, mapped_area)
+
+    assert result["overall_accuracy"] == pytest.approx(1)
+    np.testing.assert_allclose(result["users_accuracy"].values, [1, 1])
+    np.testing.assert_allclose(result["producers_accuracy"].values, [1, 1])
+    np.testing.assert_allclose(result["area"].values, mapped_area.values)
+
+
+def test_area_weighted_accuracy_class_without_samples():
+    # class 3 is mapped, but has no reference samples
+    matrix = pd.DataFrame([[10, 0], [0, 5]], index=[1, 2], columns=[1, 2])
+    mapped_area = pd.Series([25.0, 50.0, 25.0], index=[1, 2, 3])
+
+    result = area_weighted_accuracy(matrix, mapped_area)
+
+    assert result["overall_accuracy"] == pytest.approx(0.75)
+    assert np.isnan(result["users_accuracy"][3])
+    assert np.isnan(result["producers_accuracy"][3])
+    assert result["area"][3] == 0
+
+
+def test_confusion_matrix(tiles, reference):
+    matrix = confusion_matrix(tiles, reference)
+
+    # samples: first tile (1, 1) and (2, 1); nodata in the first tile, read from the second one (2, 2); second tile
+    # (2, 2). The sample over nodata in all tiles and the sample outside all tiles are not considered
+    expected = pd.DataFrame([[1, 0], [1, 2]], index=[1, 2], columns=[1, 2])
+    np.testing.assert_array_equal(matrix.values, expected.values)
+    assert list(matrix.index) == [1, 2]
+    assert matrix.index.name == "map" and matrix.columns.name == "reference"
+
+
+def test_confusion_matrix_reprojected_reference(tiles, reference):
+    matrix = confusion_matrix(tiles, reference.to_crs("EPSG:3857"))
+    assert matrix.values.sum() == 4
+
+
+def test_confusion_matrix_without_samples(tiles, reference):
+    assert confusion_matrix(tiles, reference.iloc[[2, 5]]).empty
+
+
+def test_class_area(tmp_path):
+    tiles = [
+        _tile(tmp_path / "tile1.tif", 0, [[1, 2], [-9999, 1]]),
+        _tile(tmp_path / "tile2.tif", 2, [[2, 2], [3, 2]])
+    ]
+
+    assert class_area(tiles).to_dict() == {1: 2.0, 2: 4.0, 3: 1.0}
+
+
+def test_accuracy_assessment(tiles, reference):
+    result = accuracy_assessment(tiles, reference)
+
+    assert set(result.keys()) == {"confusion_matrix", "mapped_area", "overall_accuracy", "users_accuracy",
+                                  "producers_accuracy", "area"}
+    assert result["mapped_area"].sum() == 6
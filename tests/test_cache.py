@@ -0,0 +1,138 @@
+#
+# This file is part of datacube-classification
+# Copyright (C) 2021 INPE.
+#
+# datacube-classification Library is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+#
+"""preprocessed data cube cache tests"""
+
+import gc
+import glob
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray
+
+pytest.importorskip("netCDF4")
+pytest.importorskip("scipy")
+
+from datacube_classification import cache as cache_module  # noqa: E402
+from datacube_classification.cache import PreprocessingCache  # noqa: E402
+
+
+def _block(x0=0.0):
+    values = np.arange(3 * 2 * 2, dtype="int16").reshape((3, 2, 2))
+    quality = np.zeros((3, 2, 2), dtype="uint8")
+    quality[1] = 4
+
+    return xarray.Dataset({
+        "band": (["time", "y", "x"], values),
+        "Fmask4": (["time", "y", "x"], quality)
+    }, coords={
+        "time": pd.date_range("2020-01-01", periods=3, freq="16D"),
+        "y": [1.5, 0.5],
+        "x": x0 + np.array([0.5, 1.5])
+    }, attrs={"crs": "EPSG:4326"})
+
+
+@pytest.fixture
+def computations(monkeypatch):
+    """Counts the preprocessed data cubes"""
+    calls = []
+    interpolate = cache_module.datacube_temporal_interpolate
+
+    def counted(data):
+        calls.append(threading.get_ident())
+        time.sleep(0.1)
+        return interpolate(data)
+
+    monkeypatch.setattr(cache_module, "datacube_temporal_interpolate", counted)
+    return calls
+
+
+def _files(directory, extension):
+    return sorted(glob.glob(os.path.join(directory, f"*.{extension}")))
+
+
+def test_product_is_required(tmp_path):
+    with pytest.raises(ValueError):
+        PreprocessingCache(str(tmp_path), product=None)
+
+
+def test_keys(tmp_path):
+    cb4 = PreprocessingCache(str(tmp_path), product="CB4")
+    lc8 = PreprocessingCache(str(tmp_path), product="LC8")
+
+    assert cb4.key(_block(), "Fmask4") == cb4.key(_block(), "Fmask4")
+    assert cb4.key(_block(), "Fmask4") != lc8.key(_block(), "Fmask4")
+    assert cb4.key(_block(), "Fmask4") != cb4.key(_block(10), "Fmask4")
+
+
+def test_get(tmp_path, computations):
+    cache = PreprocessingCache(str(tmp_path), product="CB4")
+
+    computed = cache.get(_block(), "Fmask4")
+    cached = cache.get(_block(), "Fmask4")
+
+    assert len(computations) == 1
+    assert "Fmask4" not in cached.data_vars
+    np.testing.assert_allclose(cached["band"].values, computed["band"].values)
+    np.testing.assert_allclose(cached["band"].values[1], [[4, 5], [6, 7]])
+    assert cached.attrs["crs"] == "EPSG:4326"
+
+
+def test_missing_file_is_a_miss(tmp_path, computations):
+    cache = PreprocessingCache(str(tmp_path), product="CB4")
+
+    cache.get(_block(), "Fmask4")
+    os.remove(_files(str(tmp_path), "nc")[0])
+    cache.get(_block(), "Fmask4")
+
+    assert len(computations) == 2
+
+
+def test_concurrent_miss_is_computed_once(tmp_path, computations):
+    cache = PreprocessingCache(str(tmp_path), product="CB4")
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda _: cache.get(_block(), "Fmask4"), range(4)))
+
+    assert len(computations) == 1
+    for result in results:
+        np.testing.assert_allclose(result["band"].values, results[0]["band"].values)
+
+
+def test_eviction(tmp_path, computations):
+    cache = PreprocessingCache(str(tmp_path), product="CB4", max_size=1)
+    cache.get(_block(), "Fmask4")
+
+    # the cache budget is exceeded: the least recently used (and unused) files are removed with their lock files
+    cache.get(_block(10), "Fmask4")
+    assert _files(str(tmp_path), "nc") == []
+    assert _files(str(tmp_path), "lock") == []
+
+
+def test_eviction_skips_opened_files(tmp_path, computations):
+    cache = PreprocessingCache(str(tmp_path), product="CB4")
+    cache.get(_block(), "Fmask4")
+
+    opened = cache.get(_block(), "Fmask4")
+    path = _files(str(tmp_path), "nc")[0]
+
+    cache._max_size = 1
+    cache.get(_block(10), "Fmask4")
+    assert _files(str(tmp_path), "nc") == [path]
+
+    opened.close()
+    del opened
+    gc.collect()
+
+    cache.get(_block(20), "Fmask4")
+    assert _files(str(tmp_path), "nc") == []
+    assert _files(str(tmp_path), "lock") == []
@@ -0,0 +1,99 @@
+#
+# This file is part of datacube-classification
+# Copyright (C) 2021 INPE.
+#
+# datacube-classification Library is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+#
+"""datacube-stats classification operations tests"""
+
+import numpy as np
+import pytest
+import xarray
+
+pytest.importorskip("datacube_stats")
+joblib = pytest.importorskip("joblib")
+
+from datacube_classification.operations import classification  # noqa: E402
+
+
+class LabelModel:
+    """Model whose `predict` differs from the most probable class (as in `SVC(probability=True)`)"""
+
+    def __init__(self, label, probable_label, classes=(10, 20, 30)):
+        self.classes_ = np.array(classes)
+        self._label = label
+        self._probable_label = probable_label
+
+    def predict(self, x):
+        return np.full(len(x), self._label)
+
+    def predict_proba(self, x):
+        probs = np.full((len(x), len(self.classes_)), 0.1)
+        probs[:, list(self.classes_).index(self._probable_label)] = 0.8
+        return probs
+
+
+@pytest.fixture
+def block():
+    return xarray.Dataset({
+        "band": (["time", "y", "x"], np.arange(24, dtype="int16").reshape((2, 3, 4)))
+    }, coords={
+        "time": np.array(["2020-01-01", "2020-01-17"], dtype="datetime64[ns]"),
+        "y": [30.0, 20.0, 10.0],
+        "x": [100.0, 110.0, 120.0, 130.0]
+    }, attrs={"crs": "EPSG:4326"})
+
+
+def _dump(tmp_path, name, model):
+    path = str(tmp_path / f"{name}.joblib")
+    joblib.dump(model, path)
+    return path
+
+
+def test_multi_classifier_maps(tmp_path, block):
+    operation = classification.ScikitLearnMultiClassifier({
+        "a": _dump(tmp_path, "a", LabelModel(10, 30)),
+        "b": _dump(tmp_path, "b", LabelModel(20, 30))
+    }, n_jobs=2)
+
+    result = operation.compute(block)
+
+    assert list(result.data_vars) == ["classification_a", "classification_b"]
+    assert (result["classification_a"].values == 10).all()
+    assert (result["classification_b"].values == 20).all()
+
+
+def test_multi_classifier_ensemble_keeps_model_maps(tmp_path, block):
+    operation = classification.ScikitLearnMultiClassifier({
+        "a": _dump(tmp_path, "a", LabelModel(10, 30)),
+        "b": _dump(tmp_path, "b", LabelModel(20, 20))
+    }, ensemble="soft")
+
+    result = operation.compute(block)
+
+    # the models maps are the same created without the ensemble
+    assert (result["classification_a"].values == 10).all()
+    assert (result["classification_b"].values == 20).all()
+
+    # mean probabilities: [0.1, 0.45, 0.45] -> first most probable class
+    assert (result["classification_ensemble"].values == 20).all()
+
+
+def test_multi_classifier_ensemble_requires_same_classes(tmp_path):
+    with pytest.raises(RuntimeError):
+        classification.ScikitLearnMultiClassifier({
+            "a": _dump(tmp_path, "a", LabelModel(10, 30)),
+            "b": _dump(tmp_path, "b", LabelModel(20, 20, classes=(10, 20)))
+        }, ensemble="soft")
+
+
+def test_smoothed_classification_labels(block):
+    pytest.importorskip("smoothing")
+
+    probs = np.zeros((12, 3))
+    probs[:, 2] = 1
+
+    result = classification._smoothed_classification(np.array([10, 20, 30]), probs, block,
+                                                      {"window_dim": 3}, 10000)
+    assert (result == 30).all()
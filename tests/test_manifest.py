@@ -0,0 +1,171 @@
+#
+# This file is part of datacube-classification
+# Copyright (C) 2021 INPE.
+#
+# datacube-classification Library is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+#
+"""processing manifests tests"""
+
+import uuid
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+import xarray
+
+from datacube_classification import precision
+from datacube_classification.manifest import ManifestMixin, ManifestRecorder
+
+TIME = ["2020-01-01", "2020-12-31"]
+
+
+class Dataset:
+    """Minimal datacube.model.Dataset"""
+
+    def __init__(self, product, center_time, metadata=None):
+        self.id = uuid.uuid4()
+        self.product = product
+        self.center_time = pd.Timestamp(center_time, tz="UTC").to_pydatetime()
+        self.metadata_doc = metadata or {"product": product}
+
+
+class Datacube:
+    """Minimal datacube.Datacube index (datasets are searched by product and time)"""
+
+    def __init__(self, datasets):
+        self.datasets = list(datasets)
+
+    def find_datasets(self, product, time, **query):
+        start, end = pd.Timestamp(time[0], tz="UTC"), pd.Timestamp(time[1], tz="UTC")
+        return [
+            dataset for dataset in self.datasets
+            if dataset.product == product and start <= dataset.center_time <= end
+        ]
+
+
+@pytest.fixture(autouse=True)
+def restore_precision():
+    policy = precision.get_precision()
+    yield
+    precision.set_precision(policy)
+
+
+@pytest.fixture
+def dc():
+    return Datacube([Dataset("CB4", "2020-01-01"), Dataset("CB4", "2020-01-17"), Dataset("LC8", "2020-01-05")])
+
+
+def _block(x0=0.0, dates=("2020-01-01", "2020-01-17")):
+    return xarray.Dataset({
+        "band": (["time", "y", "x"], np.zeros((len(dates), 2, 2), dtype="int16"))
+    }, coords={
+        "time": pd.to_datetime(list(dates)),
+        "y": [1.5, 0.5],
+        "x": x0 + np.array([0.5, 1.5])
+    }, attrs={"crs": "EPSG:4326"})
+
+
+def _recorder(tmp_path, dc, **kwargs):
+    return ManifestRecorder(str(tmp_path), ["CB4"], TIME, operation="classification", dc=dc, **kwargs)
+
+
+def test_time_is_required(tmp_path, dc):
+    with pytest.raises(ValueError):
+        ManifestRecorder(str(tmp_path), ["CB4"], None, dc=dc)
+
+
+def test_pending_manifests_are_stale(tmp_path, dc):
+    recorder = _recorder(tmp_path, dc)
+    manifest = recorder.record(_block())
+
+    assert len(manifest["inputs"]) == 2
+    assert recorder.plan() == [manifest["extent"]]
+
+    assert recorder.commit() == 1
+    assert recorder.plan() == []
+
+
+def test_new_inputs(tmp_path, dc):
+    recorder = _recorder(tmp_path, dc)
+    recorder.record(_block())
+    recorder.record(_block(10))
+    recorder.commit()
+
+    dc.datasets.append(Dataset("CB4", "2020-02-02"))
+
+    # the spatial search is not implemented in the stub, so both blocks are stale
+    assert len(recorder.plan()) == 2
+
+
+def test_inputs_ingested_after_load(tmp_path, dc):
+    recorder = _recorder(tmp_path, dc)
+
+    # a scene ingested after the block was loaded is not considered processed
+    dc.datasets.append(Dataset("CB4", "2020-02-02"))
+    manifest = recorder.record(_block())
+    recorder.commit()
+
+    assert len(manifest["inputs"]) == 2
+    assert recorder.plan() == [manifest["extent"]]
+
+
+def test_changed_configuration(tmp_path, dc):
+    _recorder(tmp_path, dc, configuration={"smoothing": None}).record(_block())
+    _recorder(tmp_path, dc, configuration={"smoothing": None}).commit()
+
+    assert _recorder(tmp_path, dc, configuration={"smoothing": None}).plan() == []
+    assert len(_recorder(tmp_path, dc, configuration={"smoothing": {"window_dim": 5}}).plan()) == 1
+
+    precision.set_precision("float32" if precision.get_precision() != "float32" else "float64")
+    assert len(_recorder(tmp_path, dc, configuration={"smoothing": None}).plan()) == 1
+
+
+def test_changed_model(tmp_path, dc):
+    model = tmp_path / "model.joblib"
+    model.write_bytes(b"model")
+
+    recorder = _recorder(tmp_path / "manifests", dc, model_files=[str(model)])
+    recorder.record(_block())
+    recorder.commit()
+
+    model.write_bytes(b"retrained model")
+    assert len(_recorder(tmp_path / "manifests", dc, model_files=[str(model)]).plan()) == 1
+
+
+def test_operations_are_independent(tmp_path, dc):
+    _recorder(tmp_path, dc).record(_block())
+
+    other = ManifestRecorder(str(tmp_path), ["CB4"], TIME, operation="metrics", dc=dc)
+    assert other.plan() == []
+    assert other.commit() == 0
+
+
+def test_plan_region(tmp_path, dc):
+    recorder = _recorder(tmp_path / "manifests", dc)
+    assert recorder.plan_region(str(tmp_path / "region.geojson")) is None
+
+    recorder.record(_block())
+    recorder.record(_block(10))
+
+    region = recorder.plan_region(str(tmp_path / "region.geojson"))
+    assert region == {"from_file": str(tmp_path / "region.geojson")}
+
+    blocks = gpd.read_file(region["from_file"])
+    assert len(blocks) == 2
+    np.testing.assert_allclose(blocks.total_bounds, [0.5, 0.5, 11.5, 1.5])
+
+
+def test_mixin(tmp_path, dc):
+    class Operation(ManifestMixin):
+        def __init__(self, manifest):
+            self._setup_manifest(manifest, configuration={})
+
+    assert Operation(None).stale_blocks() == []
+
+    operation = Operation({"directory": str(tmp_path), "products": ["CB4"], "time": TIME, "dc": dc})
+    operation._record_manifest(_block())
+    assert len(operation.stale_blocks()) == 1
+    assert ManifestRecorder(str(tmp_path), ["CB4"], TIME, operation="Operation", dc=dc).commit() == 1
+    assert operation.stale_blocks() == []
@@ -0,0 +1,89 @@
+#
+# This file is part of datacube-classification
+# Copyright (C) 2021 INPE.
+#
+# datacube-classification Library is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+#
+"""classification models tests"""
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("sklearn")
+pytest.importorskip("joblib")
+
+from sklearn.tree import DecisionTreeClassifier  # noqa: E402
+
+from datacube_classification.models import _cv_folds, select_sklearn_model  # noqa: E402
+
+
+@pytest.fixture
+def samples():
+    rng = np.random.default_rng(0)
+    n = 120
+
+    # the label depends on the first feature
+    features = rng.normal(size=(n, 4))
+    ts = pd.DataFrame(features, columns=[f"band{i}" for i in range(4)]).assign(label=(features[:, 0] > 0) + 1)
+
+    # samples not extracted are not in the time series table
+    locations = gpd.GeoDataFrame(geometry=gpd.points_from_xy(rng.uniform(0, 100, n + 10), rng.uniform(0, 100, n + 10)))
+    return ts.set_index(rng.permutation(n + 10)[:n]), locations
+
+
+def test_spatial_folds(samples):
+    ts, locations = samples
+    folds = _cv_folds(ts, ts["label"].to_numpy(), locations, block_size=25, n_splits=4)
+
+    geometry = locations.geometry.loc[ts.index]
+    blocks = pd.Series(list(zip(geometry.x // 25, geometry.y // 25)))
+
+    assert len(folds) == 4
+    np.testing.assert_array_equal(np.sort(np.concatenate([test for _, test in folds])), np.arange(len(ts)))
+    for train, test in folds:
+        assert not set(blocks.iloc[train]) & set(blocks.iloc[test])
+
+
+def test_stratified_folds(samples):
+    ts, _ = samples
+    folds = _cv_folds(ts, ts["label"].to_numpy(), n_splits=3, random_state=0)
+
+    assert len(folds) == 3
+    for train, test in folds:
+        assert len(np.intersect1d(train, test)) == 0
+
+
+@pytest.mark.parametrize("spatial", [False, True])
+def test_select_sklearn_model(samples, spatial):
+    ts, locations = samples
+    kwargs = {"geometry_location": locations, "block_size": 25} if spatial else {"random_state": 0}
+
+    model, report = select_sklearn_model(DecisionTreeClassifier(random_state=0), ts, {"max_depth": [1, 8]},
+                                         n_splits=3, n_jobs=2, **kwargs)
+
+    assert list(report.columns) == ["candidate", "params", "fold", "fit_time", "score_time", "score"]
+    assert len(report) == 6
+    assert (report[["fit_time", "score_time"]] >= 0).all().all()
+
+    best = report.groupby("candidate")["score"].mean().idxmax()
+    assert model.get_params()["max_depth"] == report.loc[report["candidate"] == best, "params"].iloc[0]["max_depth"]
+    assert model.score(ts.drop(columns="label"), ts["label"]) > 0.9
+
+
+def test_select_sklearn_model_scores(samples):
+    from sklearn.model_selection import StratifiedKFold
+
+    ts, _ = samples
+    _, report = select_sklearn_model(DecisionTreeClassifier(random_state=0), ts, {"max_depth": [2]}, n_splits=3,
+                                     n_jobs=1, random_state=0)
+
+    # same scores of fitting each fold with the original samples order
+    x, y = ts.drop(columns="label").to_numpy(), ts["label"].to_numpy()
+    expected = [
+        DecisionTreeClassifier(random_state=0, max_depth=2).fit(x[train], y[train]).score(x[test], y[test])
+        for train, test in StratifiedKFold(n_splits=3, shuffle=True, random_state=0).split(x, y)
+    ]
+    np.testing.assert_allclose(report["score"], expected)
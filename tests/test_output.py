@@ -0,0 +1,99 @@
+#
+# This file is part of datacube-classification
+# Copyright (C) 2021 INPE.
+#
+# datacube-classification Library is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+#
+"""output construction tests"""
+
+import numpy as np
+import pytest
+import xarray
+
+from datacube_classification.operations.output import OutputBuilder, block_coordinates
+
+
+@pytest.fixture
+def block():
+    return xarray.Dataset({
+        "band": (["time", "y", "x"], np.zeros((2, 3, 4), dtype="int16"))
+    }, coords={
+        "time": np.array(["2020-01-01", "2020-01-17"], dtype="datetime64[ns]"),
+        "y": [30.0, 20.0, 10.0],
+        "x": [100.0, 110.0, 120.0, 130.0]
+    }, attrs={"crs": "EPSG:4326"})
+
+
+def test_write_casts_to_measurement_dtype(block):
+    output = OutputBuilder(block, [{"name": "classification", "dtype": "int16", "nodata": -9999}])
+    output.write("classification", np.arange(12, dtype="int64"))
+
+    result = output.build()
+    assert result["classification"].dtype == np.int16
+    assert result["classification"].dims == ("y", "x")
+    np.testing.assert_array_equal(result["classification"].values, np.arange(12).reshape((3, 4)))
+    assert result.attrs["crs"] == "EPSG:4326"
+
+
+def test_write_keeps_nan_as_nodata(block):
+    output = OutputBuilder(block, [
+        {"name": "index", "dtype": "int16", "nodata": -9999},
+        {"name": "fraction", "dtype": "float32", "nodata": -3.4e+38}
+    ])
+
+    values = np.arange(12, dtype="float64")
+    values[[0, 5]] = np.nan
+    output.write("index", values)
+    output.write("fraction", values)
+
+    assert output["index"][0, 0] == -9999
+    assert output["index"][1, 1] == -9999
+    assert output["index"][2, 3] == 11
+
+    assert output["fraction"].dtype == np.float32
+    assert output["fraction"][0, 0] == np.float32(-3.4e+38)
+
+
+def test_unwritten_measurement_is_nodata(block):
+    output = OutputBuilder(block, [{"name": "classification", "dtype": "int16", "nodata": -9999}])
+    assert (output.build()["classification"].values == -9999).all()
+
+
+def test_block_coordinates_are_shared(block):
+    assert block_coordinates(block) is block_coordinates(block.copy(deep=True))
+
+
+def test_block_coordinates_2d_without_dense_grid(block):
+    coords = block_coordinates(block, "2d")
+    x_coordinate = coords["x_coordinate"][1]
+
+    x, y = np.meshgrid(block.x.values, block.y.values)
+    np.testing.assert_array_equal(x_coordinate, x)
+    np.testing.assert_array_equal(coords["y_coordinate"][1], y)
+    assert x_coordinate.strides[0] == 0
+
+
+def test_block_coordinates_invalid_type(block):
+    with pytest.raises(ValueError):
+        block_coordinates(block, "3d")
+
+
+def test_block_coordinates_shared_between_threads(block):
+    from concurrent.futures import ThreadPoolExecutor
+
+    blocks = [block.assign_coords(x=block.x + offset) for offset in range(20)] * 5
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda data: block_coordinates(data, "2d"), blocks))
+
+    for data, coords in zip(blocks, results):
+        np.testing.assert_array_equal(coords["x"][1], data.x.values)
+        np.testing.assert_array_equal(coords["x_coordinate"][1][0], data.x.values)
+
+
+def test_build_2d_coordinates(block):
+    output = OutputBuilder(block, [{"name": "classification", "dtype": "int16", "nodata": -9999}], "2d")
+    result = output.build()
+
+    assert result["x_coordinate"].dims == ("y", "x")
+    np.testing.assert_array_equal(result["y_coordinate"].values[:, 0], block.y.values)
@@ -0,0 +1,107 @@
+#
+# This file is part of datacube-classification
+# Copyright (C) 2021 INPE.
+#
+# datacube-classification Library is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+#
+"""precision policy tests"""
+
+import numpy as np
+import pytest
+import xarray
+
+from datacube_classification import precision
+
+
+@pytest.fixture(autouse=True)
+def restore_precision():
+    policy = precision.get_precision()
+    yield
+    precision.set_precision(policy)
+
+
+def test_scale_float64():
+    values = np.array([10000, 5000], dtype="int16")
+
+    scaled = precision.scale(values, 10000, "float64")
+    assert scaled.dtype == np.float64
+    np.testing.assert_allclose(scaled, [1, 0.5])
+
+
+def test_scale_float32():
+    values = np.array([10000, 5000], dtype="int16")
+
+    scaled = precision.scale(values, 10000, "float32")
+    assert scaled.dtype == np.float32
+    np.testing.assert_allclose(scaled, [1, 0.5])
+
+
+def test_scale_int_keeps_values():
+    values = np.array([10000, 5000], dtype="int16")
+    assert precision.scale(values, 10000, "int") is values
+
+
+def test_scale_does_not_modify_input():
+    values = np.array([10000.0, 5000.0])
+    precision.scale(values, 10000, "float64")
+    np.testing.assert_array_equal(values, [10000, 5000])
+
+
+def test_to_reflectance_always_scales():
+    scaled = precision.to_reflectance(np.array([5000], dtype="int16"), 10000, "int")
+    assert scaled.dtype == np.float32
+    np.testing.assert_allclose(scaled, [0.5])
+
+
+def test_policy_in_use():
+    precision.set_precision("float32")
+    assert precision.float_dtype() == np.float32
+    assert precision.scale(np.array([5000]), 10000).dtype == np.float32
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        precision.set_precision("float16")
+
+
+def test_gemi_scaled_once():
+    from datacube_classification.spectral_index import gemi
+
+    data = xarray.Dataset({
+        "red": (["time", "y", "x"], np.array([[[500, 1000]]], dtype="int16")),
+        "nir": (["time", "y", "x"], np.array([[[3000, 2000]]], dtype="int16"))
+    })
+
+    nir, red = np.array([0.3, 0.2]), np.array([0.05, 0.1])
+    epsilon = (2 * (nir ** 2 - red ** 2) + 1.5 * nir * red) / (nir + red + 0.5)
+    expected = epsilon * (1 - 0.25 * epsilon) - (red - 0.125) / (1 - red)
+
+    for policy in precision.PRECISION_POLICIES:
+        precision.set_precision(policy)
+
+        values = gemi(precision.to_reflectance(data, 10000), red_band="red", nir_band="nir")
+        np.testing.assert_allclose(values.values[0, 0], expected, rtol=1e-5)
+
+
+def user_defined_index(data, band):
+    """Index that is not invariant to the scale factor (used by `test_measurement_generator_scaling`)"""
+    return data[band] + 1
+
+
+def test_measurement_generator_scaling():
+    pytest.importorskip("datacube_stats")
+    from datacube_classification.operations.cube import MeasurementGenerator
+
+    data = xarray.Dataset({
+        "band": (["time", "y", "x"], np.array([[[5000, 2500]]], dtype="int16"))
+    }, coords={"time": [0], "y": [0.0], "x": [0.0, 1.0]}, attrs={"crs": "EPSG:4326"})
+
+    operation = MeasurementGenerator({
+        "index": {"module": __name__, "function": "user_defined_index", "args": {"band": "band"},
+                  "factor": 10000, "dtype": "int16", "nodata": -9999, "units": "1"}
+    })
+
+    for policy in precision.PRECISION_POLICIES:
+        precision.set_precision(policy)
+        np.testing.assert_array_equal(operation.compute(data)["index"].values, [[15000, 12500]])
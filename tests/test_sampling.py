@@ -0,0 +1,99 @@
+#
+# This file is part of datacube-classification
+# Copyright (C) 2021 INPE.
+#
+# datacube-classification Library is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+#
+"""training samples selection tests"""
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+
+from datacube_classification.sampling import stratified_sample
+
+
+@pytest.fixture
+def samples():
+    rng = np.random.default_rng(0)
+    labels = np.repeat([1, 2, 3], [100, 50, 10])
+    return gpd.GeoDataFrame({"label": labels}, geometry=gpd.points_from_xy(
+        rng.uniform(0, 100, len(labels)), rng.uniform(0, 100, len(labels))
+    ))
+
+
+def _chunks(samples, size):
+    return (samples.iloc[start:start + size] for start in range(0, len(samples), size))
+
+
+def test_max_per_class(samples):
+    selected = stratified_sample(samples, max_per_class=20, random_state=1)
+
+    assert selected["label"].value_counts().to_dict() == {1: 20, 2: 20, 3: 10}
+    assert list(selected.columns) == list(samples.columns)
+    assert selected.index.is_monotonic_increasing
+
+
+def test_max_per_class_by_label(samples):
+    selected = stratified_sample(samples, max_per_class={1: 5, 3: 2}, random_state=1)
+    assert selected["label"].value_counts().to_dict() == {1: 5, 2: 50, 3: 2}
+
+
+def test_proportions(samples):
+    selected = stratified_sample(samples, proportions={1: 0.5, 2: 0.3}, total=40, random_state=1)
+    assert selected["label"].value_counts().to_dict() == {1: 20, 2: 12}
+
+
+def test_reproducible_across_chunks(samples):
+    selected = stratified_sample(samples, max_per_class=20, random_state=1)
+
+    for size in (1, 7, 64):
+        chunked = stratified_sample(_chunks(samples, size), max_per_class=20, random_state=1)
+        pd.testing.assert_frame_equal(chunked, selected)
+
+    other = stratified_sample(samples, max_per_class=20, random_state=2)
+    assert not other.index.equals(selected.index)
+
+
+def test_spatial_spread():
+    # 50 samples in the first cell and one sample in each of the other 4 cells
+    x = np.concatenate([np.full(50, 5.0), [15.0, 25.0, 35.0, 45.0]])
+    samples = gpd.GeoDataFrame({"label": 1}, index=range(len(x)), geometry=gpd.points_from_xy(x, np.full(len(x), 5.0)))
+
+    for size in (len(samples), 8):
+        selected = stratified_sample(_chunks(samples, size), max_per_class=5, spread_cell_size=10, random_state=1)
+
+        assert len(selected) == 5
+        assert sorted((selected.geometry.x // 10).astype(int)) == [0, 1, 2, 3, 4]
+
+
+def test_invalid_arguments(samples):
+    with pytest.raises(ValueError):
+        stratified_sample(samples)
+
+    with pytest.raises(ValueError):
+        stratified_sample(samples, proportions={1: 1})
+
+    with pytest.raises(ValueError):
+        stratified_sample([], max_per_class=10)
+
+
+def test_chunks_read_from_file(tmp_path, samples):
+    path = str(tmp_path / "samples.gpkg")
+    samples.set_crs("EPSG:4326").to_file(path, driver="GPKG")
+
+    chunks = (gpd.read_file(path, rows=slice(start, start + 64)) for start in range(0, len(samples), 64))
+    selected = stratified_sample(chunks, max_per_class=20, random_state=1)
+
+    # chunks indexes start at 0, so the samples are identified by their row in the file
+    assert selected.index.is_unique
+    expected = stratified_sample(gpd.read_file(path), max_per_class=20, random_state=1)
+    pd.testing.assert_frame_equal(selected, expected)
+    np.testing.assert_array_equal(selected["label"], samples.loc[selected.index, "label"])
+
+
+def test_duplicated_index(samples):
+    with pytest.raises(ValueError):
+        stratified_sample(samples.set_index(samples.index % 10), max_per_class=10)
@@ -0,0 +1,171 @@
+#
+# This file is part of datacube-classification
+# Copyright (C) 2021 INPE.
+#
+# datacube-classification Library is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+#
+"""satellite image time series (sits) operations tests"""
+
+from functools import partial
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+import xarray
+from shapely.geometry import box
+
+from datacube_classification import sits
+
+
+def open_cube(x0: float, dates: int, value: int) -> xarray.Dataset:
+    """In-memory data cube opener: 4x4 pixels (1 degree) starting at `x0`, with `value + date` values"""
+    values = np.repeat(np.arange(dates, dtype="int16")[:, np.newaxis, np.newaxis] + value, 4, 1).repeat(4, 2)
+    return xarray.Dataset({"band": (["time", "y", "x"], values)}, coords={
+        "time": pd.date_range("2020-01-01", periods=dates, freq="16D"),
+        "y": [3.5, 2.5, 1.5, 0.5],
+        "x": x0 + np.array([0.5, 1.5, 2.5, 3.5])
+    }, attrs={"crs": "EPSG:4326"})
+
+
+class FlakyOpener:
+    """Opener that fails with an I/O error in the first calls"""
+
+    def __init__(self, failures, error=OSError):
+        self.calls = 0
+        self._failures = failures
+        self._error = error
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self._failures:
+            raise self._error("unavailable")
+        return open_cube(0, 2, 0)
+
+
+@pytest.fixture
+def samples():
+    # 3 samples in the first tile, 2 in the second one and 1 outside both
+    return gpd.GeoDataFrame({"label": [1, 2, 1, 2, 1, 2]}, index=[10, 11, 12, 13, 14, 15],
+                            geometry=gpd.points_from_xy([0.5, 6.5, 1.5, 5.5, 9.5, 3.5], [0.5, 1.5, 2.5, 3.5, 0.5, 2.5]),
+                            crs="EPSG:4326")
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_tiles(samples, executor):
+    datacubes = {"tile1": partial(open_cube, 0, 3, 0), "tile2": partial(open_cube, 4, 3, 100)}
+    progress = []
+
+    result = sits.datacubes_get_sits(datacubes, samples, executor=executor, max_workers=2, chunk_size=1, factor=None,
+                                     progress=lambda done, total: progress.append((done, total)))
+
+    assert list(result.index) == [10, 11, 12, 13, 15]
+    assert list(result.columns) == ["band0", "band1", "band2", "label"]
+    np.testing.assert_array_equal(result["band0"], [0, 100, 0, 100, 0])
+    np.testing.assert_array_equal(result["label"], [1, 2, 1, 2, 2])
+    assert progress == [(1, 2), (2, 2)]
+
+
+def test_footprints(samples):
+    datacubes = {"tile1": partial(open_cube, 0, 3, 0), "tile2": partial(open_cube, 4, 3, 100)}
+    footprints = {"tile1": box(0, 0, 4, 4), "tile2": box(4, 0, 8, 4)}
+
+    result = sits.datacubes_get_sits(datacubes, samples, footprints=footprints, factor=None)
+
+    assert list(result.index) == [10, 11, 12, 13, 15]
+    np.testing.assert_array_equal(result["band0"], [0, 100, 0, 100, 0])
+
+
+def test_products_with_different_timelines(samples):
+    datacubes = {
+        "CB4": partial(open_cube, 0, 5, 0),
+        "LC8_1": partial(open_cube, 0, 4, 100),
+        "LC8_2": partial(open_cube, 4, 4, 200)
+    }
+
+    result = sits.datacubes_get_sits(datacubes, samples, factor=None,
+                                     products={"CB4": "CB4", "LC8_1": "LC8", "LC8_2": "LC8"})
+
+    assert list(result.columns) == [f"CB4_band{i}" for i in range(5)] + [f"LC8_band{i}" for i in range(4)] + ["label"]
+    assert list(result.index) == [10, 11, 12, 13, 15]
+
+    # samples outside the CB4 data cube
+    np.testing.assert_array_equal(result["CB4_band4"], [4, np.nan, 4, np.nan, 4])
+    np.testing.assert_array_equal(result["LC8_band0"], [100, 200, 100, 200, 100])
+    np.testing.assert_array_equal(result["label"], [1, 2, 1, 2, 2])
+
+    # without `products`, data cubes with the same timeline are grouped
+    grouped = sits.datacubes_get_sits(datacubes, samples, factor=None)
+    assert list(grouped.columns) == list(result.columns.str.replace("LC8_", "LC8_1_"))
+    np.testing.assert_array_equal(grouped.values, result.values)
+
+
+def test_same_product_with_different_timelines(samples):
+    datacubes = {"tile1": partial(open_cube, 0, 3, 0), "tile2": partial(open_cube, 4, 2, 0)}
+
+    with pytest.raises(ValueError, match="Data cubes `tile1` and `tile2` of product `tiles`"):
+        sits.datacubes_get_sits(datacubes, samples, products={"tile1": "tiles", "tile2": "tiles"})
+
+
+def test_retry(samples):
+    opener = FlakyOpener(failures=2)
+    result = sits.datacubes_get_sits({"tile": opener}, samples, retries=2, retry_delay=0, factor=None)
+
+    assert opener.calls == 3
+    assert len(result) == 3
+
+
+def test_retry_only_io_errors(samples):
+    opener = FlakyOpener(failures=1, error=ValueError)
+
+    with pytest.raises(ValueError):
+        sits.datacubes_get_sits({"tile": opener}, samples, retries=2, retry_delay=0)
+    assert opener.calls == 1
+
+
+def test_retry_exhausted(samples):
+    with pytest.raises(OSError):
+        sits.datacubes_get_sits({"tile": FlakyOpener(failures=3)}, samples, retries=2, retry_delay=0)
+
+
+@pytest.fixture
+def labeled_timeseries():
+    rng = np.random.default_rng(0)
+    ts = pd.DataFrame(rng.integers(0, 10000, (30, 8)), columns=[f"{band}{x}" for band in ("ndvi", "evi")
+                                                                for x in range(4)])
+    return ts.assign(label=np.repeat([1, 2, 3], 10))
+
+
+def test_plot_ts_aggregated(labeled_timeseries):
+    matplotlib = pytest.importorskip("matplotlib")
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    timeline = pd.date_range("2020-01-01", periods=4, freq="16D")
+    figures = sits.plot_ts(labeled_timeseries, ["ndvi", "evi"], timeline, aggregated=True, max_samples=5,
+                           random_state=0, figsize=(4, 4))
+
+    assert len(figures) == 3
+    for figure in figures:
+        axes = figure.get_axes()
+        assert len(axes) == 2
+
+        # raw series (downsampled) in one collection and the median and quartiles lines
+        assert len(axes[0].collections) == 1
+        assert len(axes[0].collections[0].get_segments()) == 5
+        assert len(axes[0].lines) == 3
+        assert axes[1].get_title().endswith("band = evi")
+    plt.close("all")
+
+
+def test_plot_ts(labeled_timeseries):
+    matplotlib = pytest.importorskip("matplotlib")
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    timeline = pd.date_range("2020-01-01", periods=4, freq="16D")
+    figures = sits.plot_ts(labeled_timeseries, "ndvi", timeline)
+
+    assert len(figures) == 3
+    plt.close("all")